@@ -1,255 +1,133 @@
-import streamlit as st
-import joblib
+import os
 import numpy as np
-import pandas as pd
+import streamlit as st
+import tempfile
+import time
+from model_artifact import COMPACT_MODEL_PATH, PICKLE_MODEL_PATH, artifact_version
+from prediction_cache import PredictionCache
+from metrics import profiler, registry, span
+from feedback_store import FeedbackStore, FeedbackStoreFull
+from assessment_log import AssessmentLog
+from drift_monitor import DRIFT_REFERENCE_PATH, DriftMonitor
+from model_registry import CANDIDATE_MODEL_PATH, ShadowScorer
+from explanations import FEATURE_LABELS, forest_of, risk_factors
+from scoring import DEFAULT_THRESHOLD, FEATURE_NAMES
+from what_if import feature_grid, risk_curve, risk_surface
+from startup import SERVED_MODEL_PATH, warm_engine
 
 # Basic Page configuration
 st.set_page_config(page_title="Diabetes Risk Assessment", layout="centered")
 
+# Styles live in static/app.css, read once per process. Interactive
+# sections are fragments, so the stylesheet only goes out on a full page
+# run (a new session) instead of with every submit
+@st.cache_resource
+def load_styles():
+    with open("static/app.css") as f:
+        return f"<style>\n{f.read()}</style>"
+
 # Medical styling and stuff over here.
-st.markdown("""
-<style>
-/* Global medical theme - Dark Mode */
-.stApp {
-    background: linear-gradient(135deg, #1a1a1a 0%, #2d2d30 100%);
-    color: #e8e8e8;
-}
-
-/* Main header with calming medical blue */
-.main-header {
-    text-align: center;
-    color: #1565c0;
-    font-family: 'Segoe UI', 'Arial', sans-serif;
-    font-weight: 600;
-    margin-bottom: 2rem;
-    text-shadow: 0 1px 3px rgba(21, 101, 192, 0.1);
-}
-
-/* Professional medical form styling - Dark Mode */
-.stForm {
-    background: #2d2d30;
-    padding: 2rem;
-    border-radius: 12px;
-    box-shadow: 0 4px 20px rgba(0, 0, 0, 0.3);
-    border: 1px solid #404040;
-}
-
-/* Medical prediction results */
-.prediction-box {
-    padding: 2rem;
-    border-radius: 12px;
-    margin: 1.5rem 0;
-    text-align: center;
-    font-weight: 600;
-    font-size: 1.3rem;
-    box-shadow: 0 6px 25px rgba(0, 0, 0, 0.12);
-    border: 2px solid;
-}
-
-/* High risk - Medical red with psychological safety */
-.high-risk {
-    background: linear-gradient(135deg, #fff3f3 0%, #ffebee 100%);
-    border-color: #d32f2f;
-    color: #b71c1c;
-}
-
-/* Low risk - Medical green with psychological comfort */
-.low-risk {
-    background: linear-gradient(135deg, #f1f8e9 0%, #e8f5e8 100%);
-    border-color: #388e3c;
-    color: #1b5e20;
-}
-
-/* Medical information box - Dark Mode */
-.info-box {
-    background: linear-gradient(135deg, #2a2a2a 0%, #353535 100%);
-    padding: 1.5rem;
-    border-radius: 10px;
-    margin: 1.5rem 0;
-    border-left: 5px solid #1976d2;
-    box-shadow: 0 3px 15px rgba(25, 118, 210, 0.3);
-    color: #e8e8e8;
-}
-
-/* Medical metrics styling - Dark Mode */
-.metric-container {
-    background: #2d2d30;
-    padding: 1rem;
-    border-radius: 8px;
-    border: 1px solid #404040;
-    box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3);
-    color: #e8e8e8;
-}
-
-/* Form field labels - Dark Mode */
-.stSelectbox > div > label,
-.stNumberInput > div > label,
-.stTextInput > div > label,
-.stTextArea > div > label {
-    color: #81d4fa !important;
-    font-weight: 600 !important;
-    font-size: 1rem !important;
-}
-
-/* Input field styling for medical forms - Dark Mode */
-.stNumberInput > div > div > input {
-    border: 2px solid #404040;
-    border-radius: 8px;
-    padding: 0.5rem;
-    transition: border-color 0.3s ease;
-    background: #2d2d30;
-    color: #e8e8e8;
-}
-
-.stNumberInput > div > div > input:focus {
-    border-color: #1976d2;
-    box-shadow: 0 0 0 3px rgba(25, 118, 210, 0.3);
-}
-
-/* Select box medical styling - Dark Mode */
-.stSelectbox > div > div {
-    border: 2px solid #404040;
-    border-radius: 8px;
-    background: #2d2d30;
-    color: #e8e8e8;
-}
-
-.stSelectbox > div > label {
-    color: #81d4fa !important;
-    font-weight: 600 !important;
-}
-
-/* Medical button styling */
-.stFormSubmitButton > button {
-    background: linear-gradient(135deg, #1976d2 0%, #1565c0 100%);
-    color: white;
-    border: none;
-    border-radius: 8px;
-    padding: 0.75rem 2rem;
-    font-weight: 600;
-    box-shadow: 0 4px 15px rgba(25, 118, 210, 0.3);
-    transition: all 0.3s ease;
-}
-
-.stFormSubmitButton > button:hover {
-    background: linear-gradient(135deg, #1565c0 0%, #0d47a1 100%);
-    box-shadow: 0 6px 20px rgba(25, 118, 210, 0.4);
-    transform: translateY(-2px);
-}
-
-/* Medical section headers */
-h2, h3 {
-    color: #1565c0;
-    font-weight: 600;
-    border-bottom: 2px solid #e3f2fd;
-    padding-bottom: 0.5rem;
-    margin-bottom: 1rem;
-}
-
-/* Section headings in forms - Dark Mode */
-.stMarkdown strong,
-.stMarkdown b,
-.stMarkdown p strong,
-.stMarkdown p b {
-    color: #ffffff !important;
-    font-weight: 700 !important;
-    text-shadow: 0 1px 3px rgba(0, 0, 0, 0.5);
-}
-
-/* Force all text in markdown to be visible */
-.stMarkdown p {
-    color: #e8e8e8 !important;
-}
-
-/* Force all text elements to be visible */
-p, span, div {
-    color: #e8e8e8 !important;
-}
-
-/* Risk factors list styling - Dark Mode */
-.risk-factors {
-    background: #2a2a2a;
-    padding: 1rem;
-    border-radius: 8px;
-    border-left: 4px solid #ff9800;
-    margin: 1rem 0;
-    color: #e8e8e8;
-}
-
-/* Medical expander styling - Dark Mode */
-.streamlit-expanderHeader {
-    background: linear-gradient(135deg, #2a2a2a 0%, #353535 100%);
-    border-radius: 8px;
-    border: 1px solid #404040;
-    color: #64b5f6;
-    font-weight: 600;
-}
-
-/* Subtle animation for medical elements */
-@keyframes medicalPulse {
-    0% { opacity: 0.9; }
-    50% { opacity: 1; }
-    100% { opacity: 0.9; }
-}
-
-.prediction-box {
-    animation: medicalPulse 2s ease-in-out infinite;
-}
-</style>
-""", unsafe_allow_html=True)
-
-# loading the model over here
+st.markdown(load_styles(), unsafe_allow_html=True)
+
+# Decision threshold on the risk score, override with DIABETES_RISK_THRESHOLD
+RISK_THRESHOLD = float(os.environ.get("DIABETES_RISK_THRESHOLD", DEFAULT_THRESHOLD))
+
+# Grid resolution of the what-if charts, points per swept measurement
+WHAT_IF_CURVE_POINTS = 200
+WHAT_IF_SURFACE_POINTS = 80
+WHAT_IF_SINGLE_CURVE = "Nothing (single curve)"
+
+# Stage timings are written to DIABETES_METRICS_FILE at most this often (seconds)
+METRICS_WRITE_INTERVAL = 5.0
+
+# loading the model over here, once per process. The compact artifact is
+# memory-mapped so all workers share it, the pickle is only a fallback.
+# A retrained model published by model_train.py is picked up automatically.
+# Scoring mode and model variant are chosen in startup.py, which also
+# warms the engine at boot when the app is started through it
 @st.cache_resource
-def load_model():
+def load_engine():
     try:
-        model = joblib.load('diabetes_model.pkl')
-        return model
+        return warm_engine()
     except Exception as e:
         st.error(f"Model loading error: {str(e)}")
         return None
 
-def main():
-    # Medical header made over here
-    st.markdown("""
-    <div style="text-align: center; margin-bottom: 2rem;">
-        <h1 class="main-header">Diabetes Risk Assessment System</h1>
-        <p style="color: #b0b0b0; font-size: 1.1rem; margin-top: -1rem; font-weight: 500;">
-            Advanced Clinical Screening & Risk Stratification Tool
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+# Risk scores of recently seen profiles, shared by every session. Cleared
+# when the served file or the full forest changes: a derived artifact gone
+# stale is served by the full forest until it is rebuilt
+@st.cache_resource
+def load_prediction_cache():
+    watched = tuple(dict.fromkeys((SERVED_MODEL_PATH, COMPACT_MODEL_PATH, PICKLE_MODEL_PATH)))
+    return PredictionCache(artifact_path=watched)
 
-    # Medical disclaimer Made
-    st.markdown("""
-    <div class="info-box">
-        <div style="display: flex; align-items: center; margin-bottom: 0.5rem;">
-            <strong style="color: #1565c0;">Medical Disclaimer & Clinical Notice</strong>
-        </div>
-        <p style="color: #e3f2fd; font-weight: 500;">
-            This tool provides preliminary risk assessment for educational and screening purposes only. 
-            Results should not replace professional medical consultation, diagnosis, or treatment decisions.
-            Always consult qualified healthcare providers for medical advice.
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+# Audit log of every assessment, buffered and written as column files
+@st.cache_resource
+def load_assessment_log():
+    return AssessmentLog()
+
+@st.cache_data(max_entries=4)
+def load_model_version(artifact, modified_ns):
+    return artifact_version(artifact)
+
+# Version of the file the engine is actually scoring with, keyed on mtime
+# so a hot-reloaded model gets its own version
+def current_model_version(model):
+    artifact = model.served_path
+    return load_model_version(artifact, os.stat(artifact).st_mtime_ns)
+
+# Rolling input and risk score distributions against the training data,
+# None when no reference has been built with drift_monitor.py. Keyed on
+# mtime so the reference rebuilt when a model is promoted is picked up
+@st.cache_resource(max_entries=1)
+def create_drift_monitor(modified_ns):
+    return DriftMonitor.from_file(DRIFT_REFERENCE_PATH)
+
+def load_drift_monitor():
+    if not os.path.exists(DRIFT_REFERENCE_PATH):
+        return None
+    return create_drift_monitor(os.stat(DRIFT_REFERENCE_PATH).st_mtime_ns)
 
-    # Loading model again
-    model = load_model()
-    if model is None:
-        st.stop()
+# Candidate model scored off the response path, only while one is promoted
+# with `python model_registry.py promote <version> --stage candidate`.
+# The file is checked on every call, so a candidate promoted after the
+# first session starts is picked up, and only a real scorer is cached
+@st.cache_resource
+def create_shadow_scorer():
+    return ShadowScorer.for_candidate(threshold=RISK_THRESHOLD)
 
-    # Assessment form 
-    st.markdown("""
-    <div style="margin: 2rem 0 1rem 0;">
-        <h2 style="color: #1565c0;">
-            Clinical Assessment Form
-        </h2>
-        <p style="color: #b0b0b0; margin-top: -0.5rem; font-weight: 500;">
-            Please provide accurate health information for optimal risk assessment
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+def load_shadow_scorer():
+    if not os.path.exists(CANDIDATE_MODEL_PATH):
+        return None
+    return create_shadow_scorer()
+
+# Bulk uploads are scored by the sklearn forest when it is the model being
+# served, its compiled tree walk is several times faster than the flat
+# engine on large batches. Keyed on mtime so a retrained pickle is picked up
+@st.cache_resource(max_entries=1)
+def load_bulk_model(modified_ns):
+    import joblib
+    return joblib.load(PICKLE_MODEL_PATH)
+
+def bulk_model(model):
+    if model.served_path != COMPACT_MODEL_PATH or not os.path.exists(PICKLE_MODEL_PATH):
+        return model
+    return load_bulk_model(os.stat(PICKLE_MODEL_PATH).st_mtime_ns)
 
+# One feedback writer thread per process, shared by every session
+@st.cache_resource
+def load_feedback_store():
+    return FeedbackStore()
+
+# Static guide text for the input guide expander, read once per process
+@st.cache_resource
+def load_input_guide():
+    with open("static/input_guide.md") as f:
+        return f.read()
+
+# Assessment form and its results, submitting reruns only this fragment
+@st.fragment
+def assessment_section(model):
     with st.form("assessment_form"):
         # Gender selection 
         gender = st.selectbox("Gender", ["Female", "Male", "Other"])
@@ -277,177 +155,262 @@ def main():
 
         submitted = st.form_submit_button("Calculate Risk", type="primary")
 
-        if submitted:
-            # Preparing all input data with their respective feature names
-            feature_names = ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness', 
-                           'Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age']
+        # Preparing all input data in the FEATURE_NAMES order
+        input_values = [pregnancies, glucose, blood_pressure, skin_thickness,
+                        insulin, bmi, diabetes_pedigree, age]
 
-            input_values = [[pregnancies, glucose, blood_pressure, skin_thickness, 
-                           insulin, bmi, diabetes_pedigree, age]]
+        if submitted:
+            with profiler.request(), span("assessment_total"):
+                try:
+                    with span("score"):
+                        # Making prediction, label and risk score from a single forest pass,
+                        # repeat profiles come straight from the cache
+                        score_start = time.perf_counter()
+                        prediction, risk_score, _ = load_prediction_cache().score(
+                            model, input_values, RISK_THRESHOLD)
+                        score_ms = (time.perf_counter() - score_start) * 1e3
+
+                    load_assessment_log().append(input_values, risk_score, prediction,
+                                                 current_model_version(model), score_ms)
+                    shadow_scorer = load_shadow_scorer()
+                    if shadow_scorer is not None:
+                        shadow_scorer.submit(input_values, risk_score, score_ms / 1e3)
+                    drift_monitor = load_drift_monitor()
+                    if drift_monitor is not None:
+                        drift_monitor.observe(input_values, risk_score)
+
+                    with span("render_prediction"):
+                        # Displaying the results
+                        st.markdown("---")
+                        st.subheader("Assessment Results")
+
+                        if prediction == 1:
+                            st.markdown("""
+                            <div class="prediction-box high-risk">
+                                HIGH DIABETES RISK<br>
+                                Risk Score: {:.1%}
+                            </div>
+                            """.format(risk_score), unsafe_allow_html=True)
+
+                            st.warning("Recommendation: Consult with a healthcare provider for further evaluation and testing.")
+
+                        else:
+                            st.markdown("""
+                            <div class="prediction-box low-risk">
+                                LOW DIABETES RISK<br>
+                                Risk Score: {:.1%}
+                            </div>
+                            """.format(risk_score), unsafe_allow_html=True)
+
+                            st.success("Recommendation: Continue healthy lifestyle practices and regular check-ups.")
+
+                    with span("render_indicators"):
+                        # Risk factors analysis section over here
+                        st.subheader("Clinical Health Indicators")
+
+                        col1, col2, col3 = st.columns(3)
+
+                        with col1:
+                            glucose_status = "HIGH" if glucose > 125 else "NORMAL" if glucose < 100 else "ELEVATED"
+                            glucose_color = "#d32f2f" if glucose > 125 else "#388e3c" if glucose < 100 else "#ff9800"
+                            st.markdown(f"""
+                            <div class="metric-container">
+                                <h4 style="color: {glucose_color}; margin: 0;">Glucose Level</h4>
+                                <p style="font-size: 1.2rem; font-weight: bold; margin: 0.5rem 0;">{glucose} mg/dL</p>
+                                <p style="color: {glucose_color}; margin: 0; font-weight: 600;">{glucose_status}</p>
+                            </div>
+                            """, unsafe_allow_html=True)
+
+                        with col2:
+                            bmi_status = "HIGH" if bmi >= 30 else "NORMAL" if bmi < 25 else "ELEVATED"
+                            bmi_color = "#d32f2f" if bmi >= 30 else "#388e3c" if bmi < 25 else "#ff9800"
+                            st.markdown(f"""
+                            <div class="metric-container">
+                                <h4 style="color: {bmi_color}; margin: 0;">Body Mass Index</h4>
+                                <p style="font-size: 1.2rem; font-weight: bold; margin: 0.5rem 0;">{bmi:.1f} kg/m²</p>
+                                <p style="color: {bmi_color}; margin: 0; font-weight: 600;">{bmi_status}</p>
+                            </div>
+                            """, unsafe_allow_html=True)
+
+                        with col3:
+                            bp_status = "HIGH" if blood_pressure > 90 else "NORMAL"
+                            bp_color = "#d32f2f" if blood_pressure > 90 else "#388e3c"
+                            st.markdown(f"""
+                            <div class="metric-container">
+                                <h4 style="color: {bp_color}; margin: 0;">Blood Pressure</h4>
+                                <p style="font-size: 1.2rem; font-weight: bold; margin: 0.5rem 0;">{blood_pressure} mmHg</p>
+                                <p style="color: {bp_color}; margin: 0; font-weight: 600;">{bp_status}</p>
+                            </div>
+                            """, unsafe_allow_html=True)
+
+                    # Risk factors analysis 
+                    st.subheader("Risk Factor Analysis")
+                    with span("risk_factor_analysis"):
+                        # What this forest actually weighed for this patient, from its tree paths
+                        factors = (risk_factors(model, input_values)
+                                   if forest_of(model) is not None else None)
+
+                    with span("render_risk_factors"):
+                        if factors is None:
+                            st.info("Risk factor breakdown is only available when scoring with the forest model.")
+                        elif factors:
+                            st.markdown("""
+                            <div class="risk-factors">
+                                <h4 style="color: #d32f2f; margin-bottom: 1rem;">Identified Risk Factors:</h4>
+                            </div>
+                            """, unsafe_allow_html=True)
+                            for name, value, contribution in factors:
+                                label, unit = FEATURE_LABELS[name]
+                                st.markdown(f"• **{label}** ({value:g} {unit}".rstrip() +
+                                            f"): raised the risk score by {contribution * 100:.1f} points")
+                        else:
+                            st.markdown("""
+                            <div style="background: linear-gradient(135deg, #f1f8e9 0%, #e8f5e8 100%); 
+                                       padding: 1rem; border-radius: 8px; border-left: 4px solid #388e3c;">
+                                <h4 style="color: #1b5e20; margin: 0;">Excellent Health Profile</h4>
+                                <p style="color: #2e7d32; margin: 0.5rem 0 0 0;">No major diabetes risk factors identified</p>
+                            </div>
+                            """, unsafe_allow_html=True)
+
+                    registry.increment("assessments")
+
+                except Exception as e:
+                    registry.increment("assessment_errors")
+                    st.error(f"Prediction error: {str(e)}")
+
+            registry.write_file_every(METRICS_WRITE_INTERVAL)
+
+    what_if_section(model, input_values)
+
+# Risk over a grid of values for one or two measurements, the patient's other
+# values as last submitted. Nested in the assessment fragment so a submit
+# updates it, while changing its own controls reruns only this fragment
+@st.fragment
+def what_if_section(model, patient):
+    st.subheader("What-If Analysis")
+    if not st.toggle("Show how the risk score changes as measurements change"):
+        return
+
+    features = {FEATURE_LABELS[name][0]: name for name in FEATURE_NAMES}
+    col1, col2 = st.columns(2)
+    with col1:
+        x_label = st.selectbox("Vary", list(features), index=FEATURE_NAMES.index("Glucose"))
+    with col2:
+        y_label = st.selectbox("Against", [WHAT_IF_SINGLE_CURVE] + list(features),
+                               index=1 + FEATURE_NAMES.index("BMI"))
+    x_feature = features[x_label]
+    y_feature = features.get(y_label)
 
-            input_data = pd.DataFrame(input_values, columns=feature_names)
+    try:
+        with span("what_if"):
+            start = time.perf_counter()
+            if y_feature is None or y_feature == x_feature:
+                values, risks = risk_curve(model, patient, x_feature,
+                                           feature_grid(x_feature, WHAT_IF_CURVE_POINTS))
+                elapsed_ms = (time.perf_counter() - start) * 1e3
+                data = {"x": values.astype(np.float32), "risk": risks.astype(np.float32)}
+                spec = risk_curve_spec(x_label, patient[FEATURE_NAMES.index(x_feature)])
+            else:
+                x_values, y_values, risks = risk_surface(
+                    model, patient, x_feature, y_feature,
+                    feature_grid(x_feature, WHAT_IF_SURFACE_POINTS),
+                    feature_grid(y_feature, WHAT_IF_SURFACE_POINTS))
+                elapsed_ms = (time.perf_counter() - start) * 1e3
+                x_grid, y_grid = np.meshgrid(x_values, y_values, indexing="ij")
+                data = {"x": x_grid.ravel().astype(np.float32), "y": y_grid.ravel().astype(np.float32),
+                        "risk": risks.ravel().astype(np.float32)}
+                spec = risk_surface_spec(x_label, y_label, x_values[1] - x_values[0],
+                                         y_values[1] - y_values[0],
+                                         patient[FEATURE_NAMES.index(x_feature)],
+                                         patient[FEATURE_NAMES.index(y_feature)])
+
+        st.vega_lite_chart(data, spec, width="stretch")
+        st.caption(f"{len(data['risk']):,} scenarios scored in {elapsed_ms:.1f} ms, "
+                   "every other measurement as entered above")
+    except Exception as e:
+        st.error(f"What-if analysis error: {str(e)}")
+
+def risk_curve_spec(x_label, patient_value):
+    """Line of risk over one measurement, the decision threshold and the patient's value"""
+    percent = {"format": ".0%"}
+    return {
+        "height": 320,
+        "layer": [
+            {"mark": {"type": "line", "color": "#1976d2", "interpolate": "step-after"},
+             "encoding": {
+                 "x": {"field": "x", "type": "quantitative", "title": x_label, "scale": {"zero": False}},
+                 "y": {"field": "risk", "type": "quantitative", "title": "Risk score",
+                       "scale": {"domain": [0, 1]}, "axis": percent},
+                 "tooltip": [{"field": "x", "type": "quantitative", "title": x_label},
+                             {"field": "risk", "type": "quantitative", "title": "Risk score", **percent}]}},
+            {"data": {"values": [{}]}, "mark": {"type": "rule", "color": "#d32f2f", "strokeDash": [4, 4]},
+             "encoding": {"y": {"datum": RISK_THRESHOLD}}},
+            {"data": {"values": [{}]}, "mark": {"type": "rule", "color": "#ff9800"},
+             "encoding": {"x": {"datum": patient_value}}},
+        ],
+    }
+
+def risk_surface_spec(x_label, y_label, x_step, y_step, patient_x, patient_y):
+    """Heatmap of risk over two measurements with the patient marked"""
+    percent = {"format": ".0%"}
+    return {
+        "height": 360,
+        # Each grid point is the lower corner of its cell
+        "transform": [{"calculate": f"datum.x + {x_step}", "as": "x2"},
+                      {"calculate": f"datum.y + {y_step}", "as": "y2"}],
+        "layer": [
+            {"mark": "rect",
+             "encoding": {
+                 "x": {"field": "x", "type": "quantitative", "title": x_label, "scale": {"zero": False, "nice": False}},
+                 "x2": {"field": "x2"},
+                 "y": {"field": "y", "type": "quantitative", "title": y_label, "scale": {"zero": False, "nice": False}},
+                 "y2": {"field": "y2"},
+                 "color": {"field": "risk", "type": "quantitative", "title": "Risk score",
+                           "scale": {"scheme": "redyellowgreen", "reverse": True, "domain": [0, 1]},
+                           "legend": percent},
+                 "tooltip": [{"field": "x", "type": "quantitative", "title": x_label},
+                             {"field": "y", "type": "quantitative", "title": y_label},
+                             {"field": "risk", "type": "quantitative", "title": "Risk score", **percent}]}},
+            {"data": {"values": [{}]},
+             "mark": {"type": "point", "shape": "cross", "size": 250, "filled": True, "color": "#ffffff"},
+             "encoding": {"x": {"datum": patient_x}, "y": {"datum": patient_y}}},
+        ],
+    }
+
+@st.fragment
+def bulk_screening_section(model):
+    with st.expander("Bulk Screening: Score a CSV of Patients"):
+        st.write("• Upload a CSV with the same columns as the PIMA dataset (Pregnancies ... Age)")
+        st.write("• Rows are scored in chunks, so large screening files are fine")
+        uploaded_file = st.file_uploader("Patient CSV", type=["csv"])
+        explain = st.checkbox("Add per-feature risk contributions", disabled=forest_of(model) is None)
+
+        if uploaded_file is not None and st.button("Score File"):
+            progress_text = st.empty()
+
+            def report(rows, elapsed):
+                progress_text.write(f"Scored {rows:,} rows ({rows / elapsed:,.0f} rows/sec)")
 
             try:
-                # Making prediction
-                prediction = model.predict(input_data)[0]
-                probability = model.predict_proba(input_data)[0]
-                risk_score = probability[1] if len(probability) > 1 else probability[0]
-
-                # Displaying the results
-                st.markdown("---")
-                st.subheader("Assessment Results")
-
-                if prediction == 1:
-                    st.markdown("""
-                    <div class="prediction-box high-risk">
-                        HIGH DIABETES RISK<br>
-                        Risk Score: {:.1%}
-                    </div>
-                    """.format(risk_score), unsafe_allow_html=True)
-
-                    st.warning("Recommendation: Consult with a healthcare provider for further evaluation and testing.")
-
-                else:
-                    st.markdown("""
-                    <div class="prediction-box low-risk">
-                        LOW DIABETES RISK<br>
-                        Risk Score: {:.1%}
-                    </div>
-                    """.format(risk_score), unsafe_allow_html=True)
-
-                    st.success("Recommendation: Continue healthy lifestyle practices and regular check-ups.")
-
-                # Risk factors analysis section over here
-                st.subheader("Clinical Health Indicators")
-
-                col1, col2, col3 = st.columns(3)
-
-                with col1:
-                    glucose_status = "HIGH" if glucose > 125 else "NORMAL" if glucose < 100 else "ELEVATED"
-                    glucose_color = "#d32f2f" if glucose > 125 else "#388e3c" if glucose < 100 else "#ff9800"
-                    st.markdown(f"""
-                    <div class="metric-container">
-                        <h4 style="color: {glucose_color}; margin: 0;">Glucose Level</h4>
-                        <p style="font-size: 1.2rem; font-weight: bold; margin: 0.5rem 0;">{glucose} mg/dL</p>
-                        <p style="color: {glucose_color}; margin: 0; font-weight: 600;">{glucose_status}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-
-                with col2:
-                    bmi_status = "HIGH" if bmi >= 30 else "NORMAL" if bmi < 25 else "ELEVATED"
-                    bmi_color = "#d32f2f" if bmi >= 30 else "#388e3c" if bmi < 25 else "#ff9800"
-                    st.markdown(f"""
-                    <div class="metric-container">
-                        <h4 style="color: {bmi_color}; margin: 0;">Body Mass Index</h4>
-                        <p style="font-size: 1.2rem; font-weight: bold; margin: 0.5rem 0;">{bmi:.1f} kg/m²</p>
-                        <p style="color: {bmi_color}; margin: 0; font-weight: 600;">{bmi_status}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-
-                with col3:
-                    bp_status = "HIGH" if blood_pressure > 90 else "NORMAL"
-                    bp_color = "#d32f2f" if blood_pressure > 90 else "#388e3c"
-                    st.markdown(f"""
-                    <div class="metric-container">
-                        <h4 style="color: {bp_color}; margin: 0;">Blood Pressure</h4>
-                        <p style="font-size: 1.2rem; font-weight: bold; margin: 0.5rem 0;">{blood_pressure} mmHg</p>
-                        <p style="color: {bp_color}; margin: 0; font-weight: 600;">{bp_status}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-
-                # Risk factors analysis 
-                st.subheader("Risk Factor Analysis")
-                risk_factors = []
-                if glucose > 125:
-                    risk_factors.append("Elevated glucose levels (Hyperglycemia)")
-                if bmi >= 30:
-                    risk_factors.append("Obesity (BMI ≥30)")
-                elif bmi >= 25:
-                    risk_factors.append("Overweight (BMI 25-29.9)")
-                if blood_pressure > 90:
-                    risk_factors.append("Hypertension (High blood pressure)")
-                if age > 45:
-                    risk_factors.append("Advanced age (>45 years)")
-                if diabetes_pedigree > 0.5:
-                    risk_factors.append("Genetic predisposition (Family history)")
-                if gender == "Female" and pregnancies > 0:
-                    risk_factors.append("Gestational diabetes risk factor")
-
-                if risk_factors:
-                    st.markdown("""
-                    <div class="risk-factors">
-                        <h4 style="color: #d32f2f; margin-bottom: 1rem;">Identified Risk Factors:</h4>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    for factor in risk_factors:
-                        st.markdown(f"• **{factor}**")
-                else:
-                    st.markdown("""
-                    <div style="background: linear-gradient(135deg, #f1f8e9 0%, #e8f5e8 100%); 
-                               padding: 1rem; border-radius: 8px; border-left: 4px solid #388e3c;">
-                        <h4 style="color: #1b5e20; margin: 0;">Excellent Health Profile</h4>
-                        <p style="color: #2e7d32; margin: 0.5rem 0 0 0;">No major diabetes risk factors identified</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-
+                # pandas is only loaded once someone actually bulk scores
+                from bulk_score import score_csv
+                with tempfile.NamedTemporaryFile(suffix=".csv") as output_file:
+                    rows, skipped, elapsed = score_csv(bulk_model(model), uploaded_file,
+                                                       output_file.name, threshold=RISK_THRESHOLD,
+                                                       progress=report, explain=explain)
+                    with open(output_file.name, "rb") as scored:
+                        st.download_button("Download Scored CSV", scored,
+                                           file_name="scored_patients.csv", mime="text/csv")
+                st.success(f"Scored {rows - skipped:,} patients in {elapsed:.2f}s")
+                if skipped:
+                    st.warning(f"{skipped:,} rows have blank values and were left unscored, "
+                               "their RiskScore and Prediction cells are empty")
             except Exception as e:
-                st.error(f"Prediction error: {str(e)}")
-
-    # Advanced data input guidance section 
-    with st.expander("Advanced Input Guide: Clinical Parameter Details & Tips"):
-        st.subheader("Detailed Clinical Parameter Guide")
-
-        st.markdown("**GLUCOSE LEVEL (mg/dL)**")
-        st.write("• Normal Range: 70-99 mg/dL (fasting)")
-        st.write("• Use fasting glucose (8-12 hours without food) for most accurate assessment")
-        st.write("• Random glucose can be used but specify timing of last meal")
-        st.write("• If using HbA1c: 5.7-6.4% = prediabetes, ≥6.5% = diabetes")
-        st.write("• Morning values are typically most stable and reliable")
-
-        st.markdown("**BLOOD PRESSURE (mmHg)**")
-        st.write("• Normal Range: <120/80 mmHg")
-        st.write("• Enter diastolic pressure (bottom number) in the field")
-        st.write("• Take measurement after 5 minutes of rest in seated position")
-        st.write("• Use average of 2-3 readings taken 1 minute apart")
-        st.write("• Avoid caffeine, exercise, or smoking 30 minutes before measurement")
-
-        st.markdown("**BODY MASS INDEX (BMI)**")
-        st.write("• Calculation: Weight (kg) ÷ Height² (m²)")
-        st.write("• Normal: 18.5-24.9 kg/m² | Overweight: 25.0-29.9 kg/m² | Obese: ≥30.0 kg/m²")
-        st.write("• Measure weight in morning, after using bathroom, minimal clothing")
-        st.write("• Use accurate scale on hard, flat surface")
-
-        st.markdown("**INSULIN LEVEL (μU/mL)**")
-        st.write("• Normal Range: 2.6-24.9 μU/mL (fasting)")
-        st.write("• Requires laboratory blood test - not home measurable")
-        st.write("• Must be fasting sample (8-12 hours without food)")
-        st.write("• If unknown, use average value (80 μU/mL) for screening")
-
-        st.markdown("**SKIN THICKNESS (mm)**")
-        st.write("• Measurement Site: Triceps skinfold")
-        st.write("• Requires calibrated skinfold calipers for accuracy")
-        st.write("• If unknown, estimate: thin=10mm, average=20mm, larger=35mm")
-
-        st.markdown("**FAMILY HISTORY SCORE**")
-        st.write("• 0.0-0.3: No known family history of diabetes")
-        st.write("• 0.4-0.7: Distant relatives with diabetes")
-        st.write("• 0.8-1.2: One parent or sibling with Type 2 diabetes")
-        st.write("• 1.3-2.0: Multiple first-degree relatives with diabetes")
-        st.write("• 2.1-3.0: Both parents diabetic or strong family pattern")
-
-    # User feedback form section 
-    st.markdown("---")
-    st.markdown("""
-    <div style="margin: 2rem 0 1rem 0;">
-        <h2 style="color: #1565c0;">
-            Patient Feedback & Communication
-        </h2>
-        <p style="color: #b0b0b0; margin-top: -0.5rem; font-weight: 500;">
-            Share your assessment experience or ask questions for healthcare providers
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+                st.error(f"Bulk scoring error: {str(e)}")
 
+# Feedback form, submitting it leaves the assessment results on screen
+@st.fragment
+def feedback_section():
     with st.form("feedback_form"):
         st.markdown("""
         <div style="background: #2d2d30; padding: 1.5rem; border-radius: 8px; border-left: 4px solid #1976d2; margin-bottom: 1rem;">
@@ -483,7 +446,22 @@ def main():
         submitted_feedback = st.form_submit_button("Submit Feedback", type="secondary")
 
         if submitted_feedback:
+            feedback_saved = False
             if feedback_message.strip():
+                try:
+                    # Only queued here, the store's writer thread persists it
+                    load_feedback_store().submit(
+                        category=feedback_type,
+                        priority=priority_level.split(" - ")[0],
+                        message=feedback_message,
+                        name=user_name,
+                        email=user_email,
+                    )
+                    feedback_saved = True
+                except FeedbackStoreFull:
+                    st.error("We are receiving a lot of feedback right now, please try again in a moment.")
+
+            if feedback_saved:
                 st.markdown("""
                 <div style="background: linear-gradient(135deg, #e8f5e8 0%, #f1f8e9 100%); 
                            padding: 1.5rem; border-radius: 8px; border-left: 4px solid #388e3c; margin-top: 1rem;">
@@ -505,8 +483,74 @@ def main():
                     <strong>Message:</strong> {feedback_message[:200]}{"..." if len(feedback_message) > 200 else ""}
                 </div>
                 """, unsafe_allow_html=True)
-            else:
+            elif not feedback_message.strip():
                 st.warning("Please enter a message before submitting feedback.")
 
+def main():
+    # Medical header made over here
+    st.markdown("""
+    <div style="text-align: center; margin-bottom: 2rem;">
+        <h1 class="main-header">Diabetes Risk Assessment System</h1>
+        <p style="color: #b0b0b0; font-size: 1.1rem; margin-top: -1rem; font-weight: 500;">
+            Advanced Clinical Screening & Risk Stratification Tool
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Medical disclaimer Made
+    st.markdown("""
+    <div class="info-box">
+        <div style="display: flex; align-items: center; margin-bottom: 0.5rem;">
+            <strong style="color: #1565c0;">Medical Disclaimer & Clinical Notice</strong>
+        </div>
+        <p style="color: #e3f2fd; font-weight: 500;">
+            This tool provides preliminary risk assessment for educational and screening purposes only. 
+            Results should not replace professional medical consultation, diagnosis, or treatment decisions.
+            Always consult qualified healthcare providers for medical advice.
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Loading model again
+    model = load_engine()
+    if model is None:
+        st.stop()
+
+    # Assessment form 
+    st.markdown("""
+    <div style="margin: 2rem 0 1rem 0;">
+        <h2 style="color: #1565c0;">
+            Clinical Assessment Form
+        </h2>
+        <p style="color: #b0b0b0; margin-top: -0.5rem; font-weight: 500;">
+            Please provide accurate health information for optimal risk assessment
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    assessment_section(model)
+
+    # Advanced data input guidance section, one markdown element instead of dozens
+    with st.expander("Advanced Input Guide: Clinical Parameter Details & Tips"):
+        st.markdown(load_input_guide())
+
+    # Bulk screening upload section
+    bulk_screening_section(model)
+
+    # User feedback form section 
+    st.markdown("---")
+    st.markdown("""
+    <div style="margin: 2rem 0 1rem 0;">
+        <h2 style="color: #1565c0;">
+            Patient Feedback & Communication
+        </h2>
+        <p style="color: #b0b0b0; margin-top: -0.5rem; font-weight: 500;">
+            Share your assessment experience or ask questions for healthcare providers
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    feedback_section()
+
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
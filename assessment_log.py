@@ -0,0 +1,161 @@
+"""Append-only assessment audit log in NumPy column files
+
+Records are buffered in memory and written as row groups: one directory
+per group holding one .npy file per column. A group is written under a
+temporary name and renamed into place, so readers only ever see complete
+groups. Queries memory-map just the columns they need, group by group,
+so aggregations over millions of assessments never build a DataFrame.
+
+    assessments/
+        rg-<microseconds>-<pid>/timestamp.npy, Glucose.npy, ..., risk_score.npy, ...
+
+A group is written once ROW_GROUP_SIZE records are buffered or the oldest
+buffered record is MAX_BUFFER_SECONDS old, whichever comes first. The age
+limit is kept by a timer armed with the first buffered record, so a killed
+process loses at most that much of the log even when traffic stops.
+
+Group names carry the writer's pid, so several app processes can log into
+the same directory.
+"""
+import atexit
+import os
+import threading
+import time
+
+import numpy as np
+
+from scoring import FEATURE_NAMES
+
+ASSESSMENT_LOG_PATH = 'assessments'
+ROW_GROUP_SIZE = 65_536
+MAX_BUFFER_SECONDS = 60.0
+
+# Column name -> on-disk dtype
+COLUMN_DTYPES = dict(
+    [('timestamp', np.float64)]
+    + [(name, np.float32) for name in FEATURE_NAMES]
+    + [('risk_score', np.float32), ('prediction', np.int8),
+       ('model_version', 'S16'), ('latency_ms', np.float32)]
+)
+
+SECONDS_PER_DAY = 86_400
+
+
+class AssessmentLog:
+    """Buffers assessment records and flushes them as columnar row groups"""
+
+    def __init__(self, path=ASSESSMENT_LOG_PATH, row_group_size=ROW_GROUP_SIZE,
+                 max_buffer_seconds=MAX_BUFFER_SECONDS):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.max_buffer_seconds = max_buffer_seconds
+        self._buffer = {name: [] for name in COLUMN_DTYPES}
+        self._oldest = None
+        self._timer = None
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        atexit.register(self.flush)
+
+    def append(self, features, risk_score, prediction, model_version='', latency_ms=0.0,
+               timestamp=None):
+        """Buffers one assessment, writing a row group once the buffer is full or old"""
+        values = dict(zip(FEATURE_NAMES, features))
+        values.update(timestamp=time.time() if timestamp is None else timestamp,
+                      risk_score=risk_score, prediction=prediction,
+                      model_version=str(model_version).encode('ascii')[:16], latency_ms=latency_ms)
+        with self._lock:
+            for name, column in self._buffer.items():
+                column.append(values[name])
+            now = time.monotonic()
+            if self._oldest is None:
+                self._oldest = now
+                self._timer = threading.Timer(self.max_buffer_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            if (len(self._buffer['timestamp']) >= self.row_group_size
+                    or now - self._oldest >= self.max_buffer_seconds):
+                self._write_group()
+
+    def flush(self):
+        """Writes whatever is buffered as a (possibly short) row group"""
+        with self._lock:
+            if self._buffer['timestamp']:
+                self._write_group()
+
+    def _write_group(self):
+        name = f"rg-{time.time_ns() // 1000:016d}-{os.getpid()}"
+        tmp_dir = os.path.join(self.path, f".{name}.tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        for column, values in self._buffer.items():
+            np.save(os.path.join(tmp_dir, f"{column}.npy"),
+                    np.asarray(values, dtype=COLUMN_DTYPES[column]))
+        os.rename(tmp_dir, os.path.join(self.path, name))
+        self._buffer = {column: [] for column in COLUMN_DTYPES}
+        self._oldest = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def row_groups(self):
+        return sorted(entry for entry in os.listdir(self.path) if entry.startswith('rg-'))
+
+    def scan(self, columns):
+        """Yields {column: memory-mapped array} for each row group, only the columns asked for"""
+        for group in self.row_groups():
+            yield {column: np.load(os.path.join(self.path, group, f"{column}.npy"), mmap_mode='r')
+                   for column in columns}
+
+    def count(self):
+        return sum(len(group['timestamp']) for group in self.scan(['timestamp']))
+
+    def risk_distribution_by_age_band(self, age_bands=(18, 30, 45, 60, 75, 121),
+                                      risk_bins=np.linspace(0.0, 1.0, 11)):
+        """Histogram of risk scores per age band
+
+        Returns (counts, age_bands, risk_bins), counts has shape
+        (len(age_bands) - 1, len(risk_bins) - 1).
+        """
+        counts = np.zeros((len(age_bands) - 1, len(risk_bins) - 1), dtype=np.int64)
+        for group in self.scan(['Age', 'risk_score']):
+            band_counts, _, _ = np.histogram2d(group['Age'], group['risk_score'],
+                                               bins=[age_bands, risk_bins])
+            counts += band_counts.astype(np.int64)
+        return counts, np.asarray(age_bands), np.asarray(risk_bins)
+
+    def daily_positive_rate(self):
+        """{day start as Unix timestamp: (assessments, positive rate)}, days in UTC"""
+        totals, positives = {}, {}
+        for group in self.scan(['timestamp', 'prediction']):
+            days = (np.asarray(group['timestamp']) // SECONDS_PER_DAY).astype(np.int64)
+            unique_days, inverse = np.unique(days, return_inverse=True)
+            day_totals = np.bincount(inverse)
+            day_positives = np.bincount(inverse, weights=group['prediction'])
+            for day, total, positive in zip(unique_days, day_totals, day_positives):
+                totals[day] = totals.get(day, 0) + int(total)
+                positives[day] = positives.get(day, 0) + int(positive)
+        return {int(day) * SECONDS_PER_DAY: (totals[day], positives[day] / totals[day])
+                for day in sorted(totals)}
+
+    def latency_percentiles(self, percentiles=(50, 95, 99)):
+        """Scoring latency percentiles in ms over every logged assessment"""
+        latencies = [np.asarray(group['latency_ms']) for group in self.scan(['latency_ms'])]
+        if not latencies:
+            return {p: 0.0 for p in percentiles}
+        values = np.percentile(np.concatenate(latencies), percentiles)
+        return dict(zip(percentiles, values.tolist()))
+
+
+if __name__ == "__main__":
+    log = AssessmentLog()
+    print(f"{log.count():,} assessments in {len(log.row_groups())} row groups")
+
+    counts, age_bands, risk_bins = log.risk_distribution_by_age_band()
+    print("\nRisk score distribution by age band (columns are risk deciles):")
+    for band, row in enumerate(counts):
+        print(f"  {age_bands[band]:>3}-{age_bands[band + 1] - 1:<3} " + " ".join(f"{c:>7}" for c in row))
+
+    print("\nDaily positive rate (UTC):")
+    for day, (total, rate) in log.daily_positive_rate().items():
+        print(f"  {time.strftime('%Y-%m-%d', time.gmtime(day))}  {total:>9,}  {rate:6.1%}")
+
+    print("\nScoring latency ms:", log.latency_percentiles())
@@ -0,0 +1,58 @@
+"""Bulk CSV throughput: score_csv with the flat engine vs the sklearn forest
+
+bulk_score.py used to wrap the pickle in FlatForest, which is fast for a
+single row but slower than sklearn's compiled tree walk on big chunks.
+Both paths stream the same synthetic CSV, best of a few runs.
+
+Run from the repository root:  python -m benchmarks.bench_bulk_score [--rows 200000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+
+from bulk_score import DEFAULT_CHUNK_SIZE, score_csv
+from fast_forest import FlatForest
+from synthetic_data import write_dataset
+
+
+def best_rows_per_second(model, source, destination, chunk_size, repeats=3):
+    best = 0.0
+    for _ in range(repeats):
+        rows, _, elapsed = score_csv(model, source, destination, chunk_size)
+        best = max(best, rows / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    model = joblib.load('diabetes_model.pkl')
+    model.set_params(n_jobs=-1)
+    engines = {
+        'flat engine (old path)': FlatForest.from_model(model),
+        'sklearn forest': model,
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'patients.csv')
+        destination = os.path.join(directory, 'scored.csv')
+        start = time.perf_counter()
+        write_dataset(source, args.rows)
+        print(f"Wrote {args.rows:,} synthetic rows in {time.perf_counter() - start:.1f}s\n")
+
+        results = {name: best_rows_per_second(engine, source, destination, args.chunk_size)
+                   for name, engine in engines.items()}
+
+    baseline = results['flat engine (old path)']
+    for name, rows_per_second in results.items():
+        print(f"{name:<24} {rows_per_second:>12,.0f} rows/sec   {rows_per_second / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
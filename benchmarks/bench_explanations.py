@@ -0,0 +1,36 @@
+"""Cost of per-feature risk contributions, single patient and in bulk
+
+Run from the repository root:  python -m benchmarks.bench_explanations
+"""
+import time
+
+import numpy as np
+
+from benchmarks.bench_scoring import time_per_call
+from explanations import explain_batch
+from model_artifact import load_forest
+from synthetic_data import generate_rows
+
+
+def main():
+    engine = load_forest('diabetes_model.dfm')
+    rows = generate_rows(0, 100_000, seed=3).drop('Outcome', axis=1).to_numpy(np.float32)
+
+    # The first call builds the per-node path contributions, later calls reuse them
+    start = time.perf_counter()
+    engine.path_contributions(1)
+    build_seconds = time.perf_counter() - start
+    print(f"path contribution table build: {build_seconds * 1e3:8.2f} ms (once per model)\n")
+
+    print(f"{'rows':>8} {'score ms':>10} {'explain ms':>11} {'explain us/row':>15}")
+    for n in (1, 10, 100, 1_000, 10_000, 100_000):
+        batch = rows[:n]
+        repeats = max(3, min(200, 20_000 // n))
+        score_seconds = time_per_call(lambda: engine.predict_proba(batch), repeats)
+        explain_seconds = time_per_call(lambda: explain_batch(engine, batch), repeats)
+        print(f"{n:>8,} {score_seconds * 1e3:>10.2f} {explain_seconds * 1e3:>11.2f} "
+              f"{explain_seconds / n * 1e6:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
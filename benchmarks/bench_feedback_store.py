@@ -0,0 +1,71 @@
+"""Sustained feedback submissions per second: batched background writer vs one commit per submit
+
+Both paths use the store's PRAGMAs (WAL, synchronous=OFF), so the
+difference is the batching alone.
+
+Run from the repository root:  python -m benchmarks.bench_feedback_store --records 100000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from feedback_store import INSERT, SCHEMA, FeedbackStore
+
+CATEGORIES = ["Assessment Experience", "Technical Issues", "Health Questions",
+              "General Comments", "Provider Communication"]
+PRIORITIES = ["Low", "Medium", "High"]
+
+
+def records(n):
+    for i in range(n):
+        yield (CATEGORIES[i % len(CATEGORIES)], PRIORITIES[i % len(PRIORITIES)],
+               f"Feedback message number {i} about the assessment")
+
+
+def naive(path, n):
+    """What a direct write from the script thread would cost: insert + commit per submit"""
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=OFF')
+    connection.executescript(SCHEMA)
+    start = time.perf_counter()
+    for category, priority, message in records(n):
+        connection.execute(INSERT, (time.time(), category, priority, None, None, message))
+        connection.commit()
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed
+
+
+def batched(path, n):
+    store = FeedbackStore(path)
+    start = time.perf_counter()
+    for category, priority, message in records(n):
+        store.submit(category, priority, message, timeout=None)
+    accepted = time.perf_counter() - start
+    store.flush()
+    durable = time.perf_counter() - start
+    store.close()
+    return accepted, durable, store.batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--naive-records', type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        naive_seconds = naive(os.path.join(directory, 'naive.db'), args.naive_records)
+        accepted, written, batches = batched(os.path.join(directory, 'batched.db'), args.records)
+
+    print(f"per-submit commit   {args.naive_records / naive_seconds:>12,.0f} submits/s")
+    print(f"batched (accepted)  {args.records / accepted:>12,.0f} submits/s")
+    print(f"batched (written)   {args.records / written:>12,.0f} submits/s "
+          f"in {batches:,} transactions")
+
+
+if __name__ == "__main__":
+    main()
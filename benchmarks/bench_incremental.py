@@ -0,0 +1,49 @@
+"""Incremental retrain time vs new-data volume, against a full refit on all data seen
+
+Run from the repository root:  python -m benchmarks.bench_incremental --base-rows 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from model_train import build_model, publish_model, retrain_incremental, split_data
+from synthetic_data import generate_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-rows', type=int, default=200_000)
+    parser.add_argument('--chunk-rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--trees-per-chunk', type=int, default=20)
+    args = parser.parse_args()
+
+    base = generate_rows(0, args.base_rows)
+    print(f"{'new rows':>10} {'total rows':>11} {'incremental s':>14} {'full refit s':>13}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, 'model.pkl')
+        compact_path = os.path.join(directory, 'model.dfm')
+
+        for chunk_rows in args.chunk_rows:
+            # Fresh base model for every chunk size so the runs are comparable
+            X_train, _, y_train, _ = split_data(base)
+            publish_model(build_model().fit(X_train, y_train), model_path, compact_path)
+
+            chunk = generate_rows(args.base_rows, args.base_rows + chunk_rows)
+            result = retrain_incremental(chunk, model_path, compact_path,
+                                         trees_per_chunk=args.trees_per_chunk)
+
+            # What a from-scratch retrain on everything would cost instead
+            all_data = generate_rows(0, args.base_rows + chunk_rows)
+            X_train, _, y_train, _ = split_data(all_data)
+            start = time.perf_counter()
+            build_model().fit(X_train, y_train)
+            full_seconds = time.perf_counter() - start
+
+            print(f"{chunk_rows:>10,} {args.base_rows + chunk_rows:>11,} "
+                  f"{result['fit_seconds']:>14.2f} {full_seconds:>13.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
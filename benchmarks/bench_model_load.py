@@ -0,0 +1,69 @@
+"""Cold model load time and per-worker memory: joblib pickle vs memory-mapped .dfm
+
+Each loader runs in a fresh interpreter, like a newly started app worker.
+RssAnon is private memory, RssFile is file-backed pages that worker
+processes share through the page cache.
+
+Run from the repository root:  python -m benchmarks.bench_model_load
+"""
+import json
+import subprocess
+import sys
+
+WORKER = r"""
+import json, sys, time
+import numpy as np
+
+def memory():
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields
+
+before = memory()
+start = time.perf_counter()
+if sys.argv[1] == 'joblib':
+    import joblib
+    from fast_forest import FlatForest
+    model = joblib.load('diabetes_model.pkl')
+    engine = FlatForest.from_model(model)
+else:
+    from model_artifact import load_forest
+    engine = load_forest('diabetes_model.dfm')
+load_seconds = time.perf_counter() - start
+
+# First score touches the pages the traversal actually needs
+engine.predict_proba(np.array([[6, 148, 72, 35, 0, 33.6, 0.627, 50]]))
+first_score_seconds = time.perf_counter() - start
+after = memory()
+
+print(json.dumps({
+    'load_ms': load_seconds * 1e3,
+    'first_score_ms': first_score_seconds * 1e3,
+    **{key: after[key] - before.get(key, 0.0) for key in after},
+}))
+"""
+
+
+def run_worker(loader):
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', WORKER, loader],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(repeats=5):
+    print(f"{'loader':<8} {'load ms':>9} {'to 1st score ms':>16} "
+          f"{'RSS MB':>8} {'RssAnon MB':>11} {'RssFile MB':>11}")
+    for loader in ('joblib', 'dfm'):
+        runs = [run_worker(loader) for _ in range(repeats)]
+        best = min(runs, key=lambda run: run['load_ms'])
+        print(f"{loader:<8} {best['load_ms']:>9.1f} {best['first_score_ms']:>16.1f} "
+              f"{best.get('VmRSS', 0):>8.1f} {best.get('RssAnon', 0):>11.1f} "
+              f"{best.get('RssFile', 0):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Cold vs cached preprocessing time for diabetes CSVs
+
+Times parsing + imputation from scratch against loading the cached arrays,
+on diabetes.csv and optionally on a larger synthetic CSV of --rows rows.
+
+Run from the repository root:  python -m benchmarks.bench_preprocessing --rows 1000000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from preprocessing import load_dataset
+from synthetic_data import write_dataset
+
+
+def time_pipeline(path, cache_dir, repeats=5):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    start = time.perf_counter()
+    X, _, _ = load_dataset(path, cache_dir)
+    cold = time.perf_counter() - start
+
+    cached = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        X, y, _ = load_dataset(path, cache_dir)
+        # Touch every value so the memory map is actually read
+        X.sum(), y.sum()
+        cached.append(time.perf_counter() - start)
+    return len(X), cold, min(cached)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=0, help="also benchmark a synthetic CSV this large")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = ['diabetes.csv']
+        if args.rows:
+            synthetic_path = os.path.join(directory, 'synthetic.csv')
+            write_dataset(synthetic_path, args.rows)
+            paths.append(synthetic_path)
+
+        print(f"{'file':<16} {'rows':>10} {'cold ms':>10} {'cached ms':>10} {'speedup':>8}")
+        for path in paths:
+            rows, cold, cached = time_pipeline(path, os.path.join(directory, 'cache'))
+            print(f"{os.path.basename(path):<16} {rows:>10,} {cold * 1e3:>10.1f} "
+                  f"{cached * 1e3:>10.1f} {cold / cached:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
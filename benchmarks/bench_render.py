@@ -0,0 +1,143 @@
+"""Bytes sent to the browser and server render time per rerun of the app
+
+Starts the app with `streamlit run` and drives it over the websocket the
+way a browser does, so the numbers are the real ForwardMsg payloads:
+
+    first load          a new session rendering the whole page
+    calculate risk      submitting the assessment form
+    submit feedback     submitting the feedback form with a message
+
+Render time is from sending the rerun request to the script_finished
+message. Pass --app to measure another version of the script, e.g. one
+saved from an older commit into the repository root.
+
+Run from the repository root:  python -m benchmarks.bench_render
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port):
+    server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', app,
+                               '--server.headless', 'true', '--server.port', str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Streamlit server did not come up")
+
+
+async def rerun(ws, widget_states=(), fragment_id=''):
+    """Sends one rerun request, returns (bytes received, seconds, widgets seen)
+
+    widgets maps label -> (widget id, fragment id) for every widget sent.
+    """
+    message = BackMsg()
+    message.rerun_script.query_string = ''
+    message.rerun_script.fragment_id = fragment_id
+    for state in widget_states:
+        message.rerun_script.widget_states.widgets.append(state)
+
+    received = 0
+    widgets = {}
+    start = time.perf_counter()
+    await ws.send(message.SerializeToString())
+    while True:
+        data = await ws.recv()
+        received += len(data)
+        forward = ForwardMsg()
+        forward.ParseFromString(data)
+        kind = forward.WhichOneof('type')
+        if kind == 'script_finished':
+            return received, time.perf_counter() - start, widgets
+        if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+            element = forward.delta.new_element
+            widget = getattr(element, element.WhichOneof('type'))
+            if getattr(widget, 'id', '') and getattr(widget, 'label', ''):
+                widgets[widget.label] = (widget.id, forward.delta.fragment_id)
+
+
+def trigger(widget_id):
+    message = BackMsg()
+    state = message.rerun_script.widget_states.widgets.add()
+    state.id = widget_id
+    state.trigger_value = True
+    return state
+
+
+def text(widget_id, value):
+    message = BackMsg()
+    state = message.rerun_script.widget_states.widgets.add()
+    state.id = widget_id
+    state.string_value = value
+    return state
+
+
+async def measure(port, repeats):
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    results = {'first load': [], 'calculate risk': [], 'submit feedback': []}
+    for _ in range(repeats):
+        # A fresh session per repeat, like a new browser tab
+        async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as ws:
+            received, seconds, widgets = await rerun(ws)
+            results['first load'].append((received, seconds))
+
+            button, fragment = widgets['Calculate Risk']
+            received, seconds, _ = await rerun(ws, [trigger(button)], fragment)
+            results['calculate risk'].append((received, seconds))
+
+            button, fragment = widgets['Submit Feedback']
+            message, _ = widgets['Message or Questions']
+            received, seconds, _ = await rerun(ws, [text(message, "Render benchmark"), trigger(button)],
+                                               fragment)
+            results['submit feedback'].append((received, seconds))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bytes and render time per rerun")
+    parser.add_argument('--app', default='app.py')
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    port = free_port()
+    server = start_server(args.app, port)
+    try:
+        results = asyncio.run(measure(port, args.repeats))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{args.app}, {args.repeats} sessions")
+    print(f"{'scenario':<16} {'KB per rerun':>13} {'render ms p50':>14} {'render ms max':>14}")
+    for scenario, runs in results.items():
+        sizes = [received for received, _ in runs]
+        # The first session also pays for imports and model loading
+        times = [seconds * 1e3 for _, seconds in runs[1:] or runs]
+        print(f"{scenario:<16} {statistics.median(sizes) / 1024:>13.1f} "
+              f"{statistics.median(times):>14.1f} {max(times):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
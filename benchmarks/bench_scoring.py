@@ -0,0 +1,49 @@
+"""Per-request scoring latency: the old predict + predict_proba path vs single-pass scoring
+
+Run from the repository root:  python -m benchmarks.bench_scoring
+"""
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from fast_forest import FlatForest
+from scoring import FEATURE_NAMES, score
+
+
+def time_per_call(fn, repeats=200):
+    """Median wall-clock seconds per call"""
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def main():
+    model = joblib.load('diabetes_model.pkl')
+    engine = FlatForest.from_model(model)
+    row = [6, 148, 72, 35, 0, 33.6, 0.627, 50]
+
+    def two_pass():
+        # What the submit handler used to do
+        input_data = pd.DataFrame([row], columns=FEATURE_NAMES)
+        model.predict(input_data)[0]
+        model.predict_proba(input_data)[0]
+
+    results = {
+        'predict + predict_proba (sklearn)': time_per_call(two_pass),
+        'score() single pass (sklearn)': time_per_call(lambda: score(model, row)),
+        'score() single pass (flat engine)': time_per_call(lambda: score(engine, row)),
+    }
+
+    baseline = results['predict + predict_proba (sklearn)']
+    for name, seconds in results.items():
+        print(f"{name:<36} {seconds * 1e3:8.3f} ms   {baseline / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
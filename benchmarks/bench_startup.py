@@ -0,0 +1,76 @@
+"""Worker startup cost: import time, time to first score and resident memory
+
+Every variant runs in a fresh interpreter, like a newly started app worker:
+
+    eager   what app.py used to do: import pandas, sklearn and joblib up
+            front, unpickle the model, score a one-row DataFrame
+    lazy    startup.warm_engine(): memory-mapped artifact, NumPy-only
+            single-row path, nothing heavy imported
+    app     the whole Streamlit script under AppTest, first render and
+            first "Calculate Risk" click
+
+Run from the repository root:  python -m benchmarks.bench_startup
+"""
+import json
+import subprocess
+import sys
+
+WORKER = r"""
+import json, sys, time
+start = time.perf_counter()
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+variant = sys.argv[1]
+row = [6, 148, 72, 35, 0, 33.6, 0.627, 50]
+if variant == 'eager':
+    import joblib
+    import pandas as pd
+    import sklearn.ensemble
+    imported = time.perf_counter()
+    model = joblib.load('diabetes_model.pkl')
+    model.predict_proba(pd.DataFrame([row], columns=model.feature_names_in_))
+elif variant == 'lazy':
+    import startup
+    imported = time.perf_counter()
+    startup.warm_engine()
+else:
+    import streamlit
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter()
+    app = AppTest.from_file('app.py', default_timeout=120).run()
+    app.button[0].click().run()
+first_score = time.perf_counter()
+
+print(json.dumps({
+    'import_ms': (imported - start) * 1e3,
+    'first_score_ms': (first_score - start) * 1e3,
+    'rss_mb': rss_mb(),
+    'pandas_loaded': 'pandas' in sys.modules,
+    'sklearn_loaded': 'sklearn' in sys.modules,
+}))
+"""
+
+
+def run_worker(variant):
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', WORKER, variant],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(repeats=3):
+    print(f"{'variant':<8} {'import ms':>10} {'to 1st score ms':>16} {'RSS MB':>8}  heavy modules loaded")
+    for variant in ('eager', 'lazy', 'app'):
+        runs = [run_worker(variant) for _ in range(repeats)]
+        best = min(runs, key=lambda run: run['first_score_ms'])
+        loaded = [name for name in ('pandas', 'sklearn') if best[f"{name}_loaded"]]
+        print(f"{variant:<8} {best['import_ms']:>10.1f} {best['first_score_ms']:>16.1f} "
+              f"{best['rss_mb']:>8.1f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Forest fit wall-clock and speedup versus core count
+
+Run from the repository root:  python -m benchmarks.bench_training --sizes 1000 100000 1000000
+"""
+import argparse
+import os
+import time
+
+from model_train import build_model, generate_synthetic_data
+
+
+def core_counts(max_cores):
+    """1, 2, 4, ... up to and including max_cores"""
+    counts = []
+    cores = 1
+    while cores < max_cores:
+        counts.append(cores)
+        cores *= 2
+    counts.append(max_cores)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--max-cores', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'cores':>6} {'fit (s)':>10} {'speedup':>8}")
+    for n_samples in args.sizes:
+        data = generate_synthetic_data(n_samples)
+        X = data.drop('Outcome', axis=1)
+        y = data['Outcome']
+
+        single_core = None
+        for cores in core_counts(args.max_cores):
+            start = time.perf_counter()
+            build_model(n_jobs=cores).fit(X, y)
+            elapsed = time.perf_counter() - start
+            single_core = single_core or elapsed
+            print(f"{n_samples:>10,} {cores:>6} {elapsed:>10.2f} {single_core / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
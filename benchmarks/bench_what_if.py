@@ -0,0 +1,71 @@
+"""What-if sweeps: per-point loop vs one batched call vs the grid tree walk
+
+For glucose x BMI surfaces around one patient and a glucose partial
+dependence curve over every patient in diabetes.csv:
+
+    loop        score() once per grid point, like submitting the form per point
+    batched     the expanded grid rows in one score_batch call
+    tree walk   what_if (FlatForest.grid_proba), one walk of the trees
+
+The per-point loop is timed on the first LOOP_POINTS points and scaled up.
+
+Run from the repository root:  python -m benchmarks.bench_what_if
+"""
+import time
+
+import numpy as np
+
+from benchmarks.bench_scoring import time_per_call
+from model_artifact import load_forest
+from preprocessing import load_dataset
+from scoring import FEATURE_NAMES, score, score_batch
+from what_if import expand_grid, feature_grid, partial_dependence, risk_surface
+
+LOOP_POINTS = 2_000
+PATIENT = [6, 148, 72, 35, 0, 33.6, 0.627, 50]
+
+
+def loop_seconds(engine, rows):
+    sample = rows[:LOOP_POINTS]
+    start = time.perf_counter()
+    for row in sample:
+        score(engine, row)
+    return (time.perf_counter() - start) / len(sample) * len(rows)
+
+
+def report(name, points, loop, batched, walk, max_diff):
+    print(f"{name:<26} {points:>8,} {loop * 1e3:>10.0f} {batched * 1e3:>11.1f} {walk * 1e3:>11.2f} "
+          f"{loop / walk:>9,.0f}x {max_diff:>10.1e}")
+
+
+def main():
+    engine = load_forest('diabetes_model.dfm')
+    glucose, bmi = FEATURE_NAMES.index('Glucose'), FEATURE_NAMES.index('BMI')
+
+    print(f"{'sweep':<26} {'points':>8} {'loop ms':>10} {'batched ms':>11} {'walk ms':>11} "
+          f"{'vs loop':>10} {'max diff':>10}")
+    for points in (100, 200, 300):
+        x_values = np.linspace(50, 300, points)
+        y_values = feature_grid('BMI', points)
+        rows = expand_grid(PATIENT, [glucose, bmi], [x_values, y_values])
+
+        walk = time_per_call(lambda: risk_surface(engine, PATIENT, 'Glucose', 'BMI', x_values, y_values), 20)
+        batched = time_per_call(lambda: score_batch(engine, rows), 3)
+        _, _, surface = risk_surface(engine, PATIENT, 'Glucose', 'BMI', x_values, y_values)
+        _, expected = score_batch(engine, rows)
+        report(f"surface {points} x {points}", len(rows), loop_seconds(engine, rows), batched, walk,
+               np.abs(surface.ravel() - expected).max())
+
+    X, _, _ = load_dataset('diabetes.csv')
+    values = feature_grid('Glucose', 251)
+    rows = np.concatenate([expand_grid(row, [glucose], [values]) for row in X])
+    walk = time_per_call(lambda: partial_dependence(engine, X, 'Glucose', values), 3)
+    batched = time_per_call(lambda: score_batch(engine, rows), 1)
+    _, curve = partial_dependence(engine, X, 'Glucose', values)
+    _, expected = score_batch(engine, rows)
+    report(f"partial dependence, {len(X)} pts", len(rows), loop_seconds(engine, rows), batched, walk,
+           np.abs(curve - expected.reshape(len(X), -1).mean(axis=0)).max())
+
+
+if __name__ == "__main__":
+    main()
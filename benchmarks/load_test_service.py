@@ -0,0 +1,116 @@
+"""Load test for scoring_service.py: throughput and p50/p99 latency
+
+Starts the service in a subprocess (unless --url points at a running one),
+then keeps --concurrency keep-alive connections busy for --duration seconds.
+
+Run from the repository root:  python -m benchmarks.load_test_service --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+PATIENT = {'Pregnancies': 6, 'Glucose': 148, 'BloodPressure': 72, 'SkinThickness': 35,
+           'Insulin': 0, 'BMI': 33.6, 'DiabetesPedigreeFunction': 0.627, 'Age': 50}
+
+
+async def request(reader, writer, host, method, path, body=b''):
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                  ).encode('latin-1') + body)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    payload = await reader.readexactly(length)
+    return int(status_line.split()[1]), payload
+
+
+async def client(host, port, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(PATIENT).encode('utf-8')
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, 'POST', '/score', body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def wait_until_healthy(host, port, timeout=60.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            status, payload = await request(reader, writer, host, 'GET', '/health')
+            writer.close()
+            if status == 200:
+                return json.loads(payload)
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Service at {host}:{port} did not become healthy")
+
+
+async def run(host, port, concurrency, duration):
+    before = await wait_until_healthy(host, port)
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(host, port, start + duration, latencies, errors)
+                           for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    after = await wait_until_healthy(host, port)
+
+    latencies_ms = np.array(latencies) * 1e3
+    batches = after['batches'] - before['batches']
+    rows = after['rows'] - before['rows']
+    print(f"concurrency      {concurrency}")
+    print(f"requests         {len(latencies):,} ({len(errors)} errors)")
+    print(f"throughput       {len(latencies) / elapsed:,.0f} req/s")
+    print(f"latency p50      {np.percentile(latencies_ms, 50):.2f} ms")
+    print(f"latency p99      {np.percentile(latencies_ms, 99):.2f} ms")
+    print(f"mean batch size  {rows / max(batches, 1):.1f} rows over {batches:,} forest passes")
+    if 'cache' in after:
+        print(f"cache hit rate   {after['cache']['hit_rate']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="existing service, e.g. http://127.0.0.1:8080")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        host, port = '127.0.0.1', args.port
+        server = subprocess.Popen([sys.executable, '-W', 'ignore', 'scoring_service.py',
+                                   '--port', str(port)], stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(run(host, port, args.concurrency, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""End-to-end performance suite with a JSON history and a regression check
+
+Covers model loading, scoring at 1 / 100 / 10k / 1M rows, training through
+train_and_save_model() at several data sizes and preprocessing of
+diabetes.csv. Every metric is a best-of-several time, lower is better. Each run is
+appended to benchmarks/history.json and compared with
+benchmarks/baseline.json: a metric more than --tolerance slower than its
+baseline is a regression and the run exits with status 1.
+
+Run from the repository root:
+
+    python -m benchmarks.suite                    run, record and compare
+    python -m benchmarks.suite --quick            skip 1M-row scoring and 100k-row training
+    python -m benchmarks.suite --save-baseline    also make this run the new baseline
+
+Baselines only mean something on the machine they were recorded on, the
+machine details are stored with them and a mismatch is reported.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+HISTORY_PATH = os.path.join('benchmarks', 'history.json')
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+
+SCORING_ROWS = (1, 100, 10_000, 1_000_000)
+TRAINING_ROWS = (1_000, 10_000, 100_000)
+# Left out by --quick, each takes tens of seconds
+SLOW_SCORING_ROWS = 1_000_000
+SLOW_TRAINING_ROWS = 100_000
+
+PATIENT = [6, 148, 72, 35, 0, 33.6, 0.627, 50]
+
+
+def fastest(fn, repeats, warm_up=True):
+    """Best wall-clock seconds of a few calls, after a warm-up call
+
+    The minimum is far steadier than the median on a busy machine, which
+    is what a regression check needs.
+    """
+    if warm_up:
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples)
+
+
+def bench_model_load():
+    import joblib
+    from model_artifact import load_forest
+
+    return {
+        'model_load.pickle_ms': fastest(lambda: joblib.load('diabetes_model.pkl'), 5) * 1e3,
+        'model_load.dfm_ms': fastest(lambda: load_forest('diabetes_model.dfm'), 20) * 1e3,
+    }
+
+
+def bench_scoring(quick):
+    from model_artifact import load_forest
+    from scoring import score, score_batch
+    from synthetic_data import generate_rows
+
+    engine = load_forest('diabetes_model.dfm')
+    results = {'scoring.single_row_us': fastest(lambda: score(engine, PATIENT), 500) * 1e6}
+
+    sizes = [n for n in SCORING_ROWS if n > 1 and not (quick and n >= SLOW_SCORING_ROWS)]
+    rows = generate_rows(0, max(sizes), seed=5).drop('Outcome', axis=1).to_numpy(np.float32)
+    for n in sizes:
+        batch = rows[:n]
+        repeats = max(1, min(50, 100_000 // n))
+        # A million rows is warm after its first block, no separate warm-up
+        results[f'scoring.batch_{n}_ms'] = fastest(lambda: score_batch(engine, batch), repeats,
+                                                   warm_up=n < SLOW_SCORING_ROWS) * 1e3
+    return results
+
+
+def bench_training(quick):
+    from model_train import train_and_save_model
+
+    results = {}
+    original_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # Published models and their registry go to the temporary directory
+        os.chdir(directory)
+        try:
+            for n in TRAINING_ROWS:
+                if quick and n >= SLOW_TRAINING_ROWS:
+                    continue
+                samples = []
+                for _ in range(1 if n >= SLOW_TRAINING_ROWS else 3):
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        train_and_save_model(n_samples=n)
+                    samples.append(time.perf_counter() - start)
+                results[f'training.train_{n}_s'] = min(samples)
+        finally:
+            os.chdir(original_directory)
+    return results
+
+
+def bench_preprocessing():
+    from preprocessing import load_dataset
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = fastest(lambda: load_dataset('diabetes.csv', cache_dir, use_cache=False), 10)
+        cached = fastest(lambda: load_dataset('diabetes.csv', cache_dir), 50)
+    return {'preprocessing.cold_ms': cold * 1e3, 'preprocessing.cached_ms': cached * 1e3}
+
+
+def machine():
+    import sklearn
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def write_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def compare(metrics, baseline, tolerance):
+    """Prints every metric against the baseline, returns the regressed ones"""
+    regressions = []
+    print(f"\n{'metric':<32} {'current':>12} {'baseline':>12} {'change':>8}")
+    for name, value in metrics.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<32} {value:>12.3f} {'-':>12} {'new':>8}")
+            continue
+        change = value / reference - 1
+        flag = '  REGRESSION' if change > tolerance else ''
+        print(f"{name:<32} {value:>12.3f} {reference:>12.3f} {change:>+7.0%}{flag}")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the performance suite and check for regressions")
+    parser.add_argument('--quick', action='store_true', help="skip the slowest sizes")
+    parser.add_argument('--groups', nargs='+', default=['load', 'scoring', 'training', 'preprocessing'],
+                        choices=['load', 'scoring', 'training', 'preprocessing'])
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown against the baseline, as a fraction (default 0.25)")
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    groups = {
+        'load': bench_model_load,
+        'scoring': lambda: bench_scoring(args.quick),
+        'training': lambda: bench_training(args.quick),
+        'preprocessing': bench_preprocessing,
+    }
+    metrics = {}
+    for group in args.groups:
+        start = time.perf_counter()
+        metrics.update(groups[group]())
+        print(f"{group} benchmarks done in {time.perf_counter() - start:.1f}s")
+
+    run = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'machine': machine(),
+        'metrics': metrics,
+    }
+    history = read_json(args.history, [])
+    history.append(run)
+    write_json(args.history, history)
+
+    baseline = read_json(args.baseline, None)
+    regressions = []
+    if baseline is None:
+        print(f"\nNo baseline at '{args.baseline}', record one with --save-baseline")
+        for name, value in metrics.items():
+            print(f"{name:<32} {value:>12.3f}")
+    else:
+        if baseline['machine'] != run['machine']:
+            print(f"\nBaseline was recorded on a different machine ({baseline['machine']}), "
+                  "expect differences")
+        regressions = compare(metrics, baseline['metrics'], args.tolerance)
+
+    if args.save_baseline:
+        # Metrics this run skipped keep their old baseline values
+        merged = dict(baseline['metrics'] if baseline else {}, **metrics)
+        write_json(args.baseline, dict(run, metrics=merged))
+        print(f"\nBaseline written to '{args.baseline}'")
+
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
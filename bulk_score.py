@@ -0,0 +1,98 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from explanations import explain_batch, forest_of
+from fast_forest import FlatForest
+from scoring import FEATURE_NAMES, DEFAULT_THRESHOLD, score_batch
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def score_csv(model, source, destination, chunk_size=DEFAULT_CHUNK_SIZE,
+              threshold=DEFAULT_THRESHOLD, progress=None, explain=False):
+    """Streams a patient CSV through the model chunk by chunk
+
+    Each chunk is scored as one batch and appended to destination straight
+    away, so memory use depends on chunk_size rather than file size. With
+    explain=True a <feature>Contribution column per feature says how much
+    that measurement moved the row's risk score.
+    Rows with a blank (or infinite) feature are not scored, they are written
+    with empty RiskScore and Prediction cells and counted as skipped.
+    Returns (rows read, rows skipped, elapsed seconds).
+    """
+    rows = 0
+    skipped = 0
+    start = time.perf_counter()
+    reader = pd.read_csv(source, chunksize=chunk_size)
+
+    explainer = None
+    if explain:
+        # Contributions need the flat trees, built once for an sklearn forest
+        explainer = model if forest_of(model) is not None else FlatForest.from_model(model)
+
+    for index, chunk in enumerate(reader):
+        missing = [name for name in FEATURE_NAMES if name not in chunk.columns]
+        if missing:
+            raise ValueError(f"Input is missing columns: {', '.join(missing)}")
+
+        features = chunk[FEATURE_NAMES].to_numpy(dtype=np.float64)
+        complete = np.isfinite(features).all(axis=1)
+        risk_scores = np.full(len(chunk), np.nan)
+        labels = pd.array(np.zeros(len(chunk), dtype=np.int64), dtype='Int64')
+        labels[~complete] = pd.NA
+        if complete.any():
+            labels[complete], risk_scores[complete] = score_batch(model, features[complete], threshold)
+
+        chunk['RiskScore'] = risk_scores
+        chunk['Prediction'] = labels
+        if explain:
+            contributions = np.full(features.shape, np.nan)
+            if complete.any():
+                _, contributions[complete] = explain_batch(explainer, features[complete])
+            for column, name in enumerate(FEATURE_NAMES):
+                chunk[f'{name}Contribution'] = contributions[:, column]
+        chunk.to_csv(destination, mode='w' if index == 0 else 'a',
+                     header=index == 0, index=False)
+
+        rows += len(chunk)
+        skipped += int((~complete).sum())
+        if progress is not None:
+            progress(rows, time.perf_counter() - start)
+
+    return rows, skipped, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV of patients in bulk")
+    parser.add_argument('input', help="CSV with the same feature columns as diabetes.csv")
+    parser.add_argument('output', help="where to write the scored CSV")
+    parser.add_argument('--model', default='diabetes_model.pkl')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--explain', action='store_true',
+                        help="add per-feature risk contribution columns")
+    args = parser.parse_args()
+
+    # Imported here so the app can use score_csv without loading joblib.
+    # Large chunks go through sklearn itself, its compiled tree walk beats
+    # the flat engine several times over on batches (benchmarks/bench_bulk_score.py)
+    import joblib
+    model = joblib.load(args.model)
+    model.set_params(n_jobs=-1)
+
+    def report(rows, elapsed):
+        print(f"{rows:>12,} rows  {rows / elapsed:12,.0f} rows/sec", flush=True)
+
+    rows, skipped, elapsed = score_csv(model, args.input, args.output, args.chunk_size,
+                                       args.threshold, progress=report, explain=args.explain)
+    print(f"\nScored {rows - skipped:,} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec)")
+    if skipped:
+        print(f"{skipped:,} rows with blank values were left unscored")
+    print(f"Results written to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
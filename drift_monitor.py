@@ -0,0 +1,238 @@
+"""Streaming drift monitor for scored inputs and risk scores
+
+The reference is the training distribution binned into deciles per column
+(the eight features plus the model's risk score), saved once as JSON. It is
+built from the CSV's raw values, zeros for unmeasured fields included,
+because that is what observe() sees:
+
+    python drift_monitor.py --data diabetes.csv
+
+The risk scores depend on the model, so the reference records the
+artifact_version of the model that scored it and where its rows came
+from. Promoting a new production model rebuilds it from the same rows
+(see model_registry.refresh_derived).
+
+Live traffic is counted into the same bins over a rolling window of the
+last window_size observations. The window is a ring of `slices` count
+tables, so memory is fixed and an observation is a bin lookup and an
+increment. Every check_every observations PSI and a binned two-sample KS
+statistic are recomputed for each column. A column whose PSI or KS
+crosses its alert level raises an alert: the drift_alerts counter in the
+metrics registry and an optional on_alert callback.
+"""
+import argparse
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from metrics import registry
+from model_artifact import artifact_version, load_forest
+from scoring import FEATURE_NAMES, score_batch
+
+DRIFT_REFERENCE_PATH = 'drift_reference.json'
+COLUMNS = FEATURE_NAMES + ['risk_score']
+
+# Usual PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 major shift
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+
+# KS critical value coefficient for a 1% significance level
+KS_ALPHA_COEFFICIENT = 1.628
+
+# Keeps PSI finite when a bin is empty on one side
+EPSILON = 1e-4
+
+
+def build_reference(values, n_bins=10):
+    """Decile bin edges and reference proportions for each column
+
+    values maps column name -> 1-D array of training values.
+    """
+    reference = {'edges': {}, 'proportions': {}, 'rows': None}
+    for column in COLUMNS:
+        column_values = np.asarray(values[column], dtype=np.float64)
+        quantiles = np.quantile(column_values, np.linspace(0, 1, n_bins + 1)[1:-1])
+        edges = np.unique(quantiles)
+        counts = np.bincount(np.searchsorted(edges, column_values, side='right'),
+                             minlength=len(edges) + 1)
+        reference['edges'][column] = edges.tolist()
+        reference['proportions'][column] = (counts / counts.sum()).tolist()
+        reference['rows'] = int(len(column_values))
+    return reference
+
+
+def reference_rows(data):
+    """Raw feature rows a reference was built from, data is {'csv': path} or {'synthetic': rows}"""
+    if 'synthetic' in data:
+        from synthetic_data import generate_rows
+        return generate_rows(0, data['synthetic'], 42)[FEATURE_NAMES].to_numpy(np.float32)
+    # Raw values, as the app and the service observe them, not the
+    # median-imputed ones the model may have been trained on
+    from preprocessing import read_csv
+    X, _ = read_csv(data['csv'])
+    return X
+
+
+def build_model_reference(data, model_path):
+    """Reference over data's rows with the risk scores of the forest at model_path"""
+    X = reference_rows(data)
+    _, risk_scores = score_batch(load_forest(model_path), X)
+    values = {name: X[:, i] for i, name in enumerate(FEATURE_NAMES)}
+    values['risk_score'] = risk_scores
+    reference = build_reference(values)
+    reference.update(data=data, source_version=artifact_version(model_path))
+    return reference
+
+
+def save_reference(reference, path=DRIFT_REFERENCE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(reference, f)
+    os.replace(tmp_path, path)
+
+
+def load_reference(path=DRIFT_REFERENCE_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def psi(expected, actual):
+    """Population stability index between two binned distributions"""
+    expected = np.maximum(expected, EPSILON)
+    actual = np.maximum(actual, EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def binned_ks(expected, actual):
+    """Largest gap between the two CDFs, evaluated at the bin edges"""
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+
+class DriftMonitor:
+    """Rolling-window drift statistics against a saved training reference"""
+
+    def __init__(self, reference, window_size=5000, slices=10, check_every=100,
+                 min_samples=500, on_alert=None):
+        self.columns = COLUMNS
+        self.edges = [np.asarray(reference['edges'][c]) for c in self.columns]
+        self.expected = [np.asarray(reference['proportions'][c]) for c in self.columns]
+        self.reference_rows = reference['rows']
+        self.slice_size = max(1, window_size // slices)
+        self.check_every = check_every
+        self.min_samples = min_samples
+        self.on_alert = on_alert
+
+        # One count table per slice plus their running sum, for each column
+        self._slices = [[np.zeros(len(e) + 1, dtype=np.int64) for e in self.edges]
+                        for _ in range(slices)]
+        self._totals = [np.zeros(len(e) + 1, dtype=np.int64) for e in self.edges]
+        self._current = 0
+        self._in_slice = 0
+        self._since_check = 0
+        self.observed = 0
+        self.results = {}
+        self.alerts = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path=DRIFT_REFERENCE_PATH, **kwargs):
+        return cls(load_reference(path), **kwargs)
+
+    def window_count(self):
+        return int(self._totals[0].sum())
+
+    def observe(self, row, risk_score):
+        """Counts one scored request"""
+        self.observe_batch([row], [risk_score])
+
+    def observe_batch(self, rows, risk_scores):
+        """Counts many scored rows, e.g. one micro-batch of the scoring service"""
+        values = np.column_stack([np.asarray(rows, dtype=np.float64).reshape(len(risk_scores), -1),
+                                  np.asarray(risk_scores, dtype=np.float64)])
+        bins = [np.searchsorted(edges, values[:, i], side='right')
+                for i, edges in enumerate(self.edges)]
+
+        with self._lock:
+            start = 0
+            while start < len(values):
+                # Rows that still fit into the current slice
+                stop = min(len(values), start + self.slice_size - self._in_slice)
+                current = self._slices[self._current]
+                for column, column_bins in enumerate(bins):
+                    counts = np.bincount(column_bins[start:stop], minlength=len(current[column]))
+                    current[column] += counts
+                    self._totals[column] += counts
+                self._in_slice += stop - start
+                start = stop
+                if self._in_slice == self.slice_size:
+                    self._advance()
+
+            self.observed += len(values)
+            self._since_check += len(values)
+            if self._since_check >= self.check_every:
+                self._since_check = 0
+                self._check()
+
+    def _advance(self):
+        """Moves to the next slice, dropping the oldest one from the window"""
+        self._current = (self._current + 1) % len(self._slices)
+        for column, counts in enumerate(self._slices[self._current]):
+            self._totals[column] -= counts
+            counts[:] = 0
+        self._in_slice = 0
+
+    def _check(self):
+        n = self.window_count()
+        if n < self.min_samples:
+            return
+        m = self.reference_rows
+        ks_critical = KS_ALPHA_COEFFICIENT * math.sqrt((n + m) / (n * m))
+
+        results = {}
+        for column, expected, counts in zip(self.columns, self.expected, self._totals):
+            actual = counts / n
+            column_psi = psi(expected, actual)
+            column_ks = binned_ks(expected, actual)
+            if column_psi >= PSI_ALERT or column_ks >= ks_critical:
+                status = 'alert'
+            elif column_psi >= PSI_WARN:
+                status = 'warn'
+            else:
+                status = 'ok'
+            results[column] = {'psi': column_psi, 'ks': column_ks, 'ks_critical': ks_critical,
+                               'status': status}
+
+            if status == 'alert' and column not in self.alerts:
+                self.alerts.add(column)
+                registry.increment("drift_alerts")
+                if self.on_alert is not None:
+                    self.on_alert(column, results[column])
+            elif status != 'alert':
+                self.alerts.discard(column)
+        self.results = results
+
+    def status(self):
+        """Latest per-column statistics and which columns are alerting"""
+        with self._lock:
+            return {'window': self.window_count(), 'observed': self.observed,
+                    'alerts': sorted(self.alerts), 'columns': dict(self.results)}
+
+
+if __name__ == "__main__":
+    from model_artifact import COMPACT_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Build the drift reference from training data")
+    parser.add_argument('--data', default='diabetes.csv', help="labelled CSV the model is trained on")
+    parser.add_argument('--synthetic', type=int, metavar='ROWS',
+                        help="use this many generated rows instead of a CSV")
+    parser.add_argument('--model', default=COMPACT_MODEL_PATH)
+    parser.add_argument('--output', default=DRIFT_REFERENCE_PATH)
+    args = parser.parse_args()
+
+    reference = build_model_reference(
+        {'synthetic': args.synthetic} if args.synthetic else {'csv': args.data}, args.model)
+    save_reference(reference, args.output)
+    print(f"Drift reference for {reference['rows']:,} rows written to '{args.output}'")
@@ -0,0 +1,52 @@
+"""Per-prediction risk factors taken from the forest itself
+
+Every tree path a patient goes down is split into per-feature changes of
+the diabetic-class probability (Saabas decomposition, see
+FlatForest.contributions). Summed over the forest they say how much each
+measurement moved this patient's risk score away from the average.
+"""
+import numpy as np
+
+from fast_forest import FlatForest
+from scoring import FEATURE_NAMES, _positive_column, prepare_rows
+
+# How each feature is described in the results panel, with its unit
+FEATURE_LABELS = {
+    'Pregnancies': ('Number of pregnancies', ''),
+    'Glucose': ('Blood sugar level', 'mg/dL'),
+    'BloodPressure': ('Blood pressure', 'mmHg'),
+    'SkinThickness': ('Skin thickness', 'mm'),
+    'Insulin': ('Insulin level', 'μU/mL'),
+    'BMI': ('Body mass index', 'kg/m²'),
+    'DiabetesPedigreeFunction': ('Family history score', ''),
+    'Age': ('Age', 'years'),
+}
+
+
+def forest_of(model):
+    """The FlatForest behind a scoring engine, or None when it has no trees (risk table)"""
+    engine = getattr(model, 'engine', model)
+    return engine if isinstance(engine, FlatForest) else None
+
+
+def explain_batch(model, rows):
+    """(baseline risk, contributions (rows, features)) for the diabetic class
+
+    baseline + contributions.sum(axis=1) is each row's risk score. Raises
+    TypeError for engines without trees to explain.
+    """
+    forest = forest_of(model)
+    if forest is None:
+        raise TypeError(f"{type(model).__name__} has no trees to explain")
+    return forest.contributions(prepare_rows(forest, rows), _positive_column(forest))
+
+
+def risk_factors(model, row, min_contribution=0.01):
+    """Features that raised this patient's risk by at least min_contribution
+
+    Returns [(feature name, value, contribution)], largest first.
+    """
+    _, contributions = explain_batch(model, [row])
+    order = np.argsort(-contributions[0], kind='stable')
+    return [(FEATURE_NAMES[i], row[i], float(contributions[0, i]))
+            for i in order if contributions[0, i] >= min_contribution]
@@ -0,0 +1,302 @@
+import itertools
+
+import numpy as np
+
+# Rows are scored in blocks so the (rows x trees) work arrays stay small
+BLOCK_ROWS = 4096
+
+
+class FlatForest:
+    """RandomForestClassifier flattened into contiguous NumPy node arrays"""
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth,
+                 classes, feature_names=None, imputed_medians=None, source_version=None):
+        self.feature = feature          # split feature per node (0 on leaves)
+        self.threshold = threshold      # split threshold per node
+        self.children = children        # [left, right] pairs, leaves point to themselves
+        self.value = value              # normalised class probabilities per node
+        self.roots = roots              # index of each tree's root node
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.feature_names = feature_names
+        self.imputed_medians = imputed_medians  # applied to raw inputs by scoring.prepare_rows
+        self.source_version = source_version    # version of the model a derived forest was built from
+        self._path_contributions = {}
+
+    @classmethod
+    def from_model(cls, model):
+        """Builds the flat arrays from a fitted sklearn RandomForestClassifier"""
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left < 0
+            own_index = np.arange(offset, offset + n_nodes)
+
+            # Leaves loop back to themselves so every row can take max_depth steps
+            left = np.where(is_leaf, own_index, tree.children_left + offset)
+            right = np.where(is_leaf, own_index, tree.children_right + offset)
+
+            # Same normalisation DecisionTreeClassifier.predict_proba applies
+            value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            children.append(np.stack([left, right], axis=1))
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature_names = getattr(model, "feature_names_in_", None)
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.concatenate(children).astype(np.intp).ravel(),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=int(max_depth),
+            classes=np.asarray(model.classes_),
+            feature_names=None if feature_names is None else list(feature_names),
+            imputed_medians=getattr(model, 'imputed_medians', None),
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        """Memory held by the node arrays"""
+        return sum(array.nbytes for array in (self.feature, self.threshold, self.children,
+                                              self.value, self.roots))
+
+    def apply(self, X):
+        """Returns the leaf index reached in every tree, shape (rows, trees)
+
+        Inputs must be finite: NaN always goes right here, while sklearn
+        routes missing values to the side each split learned.
+        """
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        # Row offsets into the flattened input turn the 2-D gather into a 1-D take
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_offset = (np.arange(X.shape[0]) * X.shape[1])[:, np.newaxis]
+        node = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0)
+        for _ in range(self.max_depth):
+            goes_left = flat_X.take(row_offset + self.feature.take(node)) <= self.threshold.take(node)
+            next_node = self.children.take(2 * node + 1 - goes_left)
+            if np.array_equal(next_node, node):
+                break
+            node = next_node
+        return node
+
+    def predict_proba(self, X):
+        """Class probabilities, identical to the source forest's predict_proba"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        proba = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves = self.apply(X[start:start + BLOCK_ROWS])
+            # cumsum adds trees one after another, the same order sklearn uses
+            summed = np.cumsum(self.value[leaves], axis=1)[:, -1]
+            proba[start:start + BLOCK_ROWS] = summed / self.n_trees
+        return proba
+
+    def path_contributions(self, column=-1):
+        """Per-node feature contributions accumulated along the path from the root
+
+        Shape (nodes, features). Every split moves the tree's estimate of the
+        column's probability from the parent's value to the child's, and that
+        change is credited to the split feature (Saabas decomposition).
+        Built once per column, one vectorised pass per depth level.
+        """
+        if column in self._path_contributions:
+            return self._path_contributions[column]
+
+        n_features = len(self.feature_names) if self.feature_names else int(self.feature.max()) + 1
+        value = self.value[:, column]
+        paths = np.zeros((self.n_nodes, n_features), dtype=np.float64)
+        children = self.children.reshape(-1, 2)
+
+        parents = np.asarray(self.roots)
+        for _ in range(self.max_depth):
+            # Leaves point to themselves, only real splits move to a new node
+            is_split = children[parents, 0] != parents
+            parents = parents[is_split]
+            if not len(parents):
+                break
+            for side in (0, 1):
+                child = children[parents, side]
+                paths[child] = paths[parents]
+                paths[child, self.feature[parents]] += value[child] - value[parents]
+            parents = children[parents].ravel()
+
+        self._path_contributions[column] = paths
+        return paths
+
+    def contributions(self, X, column=-1):
+        """Per-feature contributions to one class's probability for every row
+
+        Returns (bias, contributions (rows, features)). bias is the mean root
+        value over the trees, and bias + contributions.sum(axis=1) equals
+        predict_proba(X)[:, column] up to rounding.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        paths = self.path_contributions(column)
+        contributions = np.empty((X.shape[0], paths.shape[1]), dtype=np.float64)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves = self.apply(X[start:start + BLOCK_ROWS])
+            contributions[start:start + BLOCK_ROWS] = paths[leaves].sum(axis=1)
+        bias = self.value[self.roots, column].mean()
+        return bias, contributions / self.n_trees
+
+    def grid_proba(self, X, features, grids, column=-1, average=False):
+        """One class's probability with some features swept over value grids
+
+        Every other feature keeps each row's value. Returns shape
+        (rows, *grid sizes), or the grid averaged over rows. Grids must be
+        in increasing order.
+
+        Instead of scoring every grid point, each tree is walked once per
+        row over boxes of grid indices: a split on another feature follows
+        the row, a split on a swept feature cuts the box in two. Every leaf
+        reached adds its value to its box through a difference array, and
+        cumulative sums fill the grid in, so the cost grows with the leaves
+        reached rather than the grid size. Equal to predict_proba on the
+        expanded grid up to rounding.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        # Inputs are compared as float32, like apply() does
+        grids = [np.asarray(grid, dtype=np.float32).astype(np.float64) for grid in grids]
+        if any(np.any(np.diff(grid) < 0) for grid in grids):
+            raise ValueError("Grid values must be in increasing order")
+        shape = np.array([len(grid) for grid in grids], dtype=np.intp)
+
+        children = self.children.reshape(-1, 2)
+        is_leaf = children[:, 0] == np.arange(self.n_nodes)
+        value = self.value[:, column]
+
+        # Grid axis of every node's split feature (-1 for the others) and the
+        # first grid index that goes right at the node
+        axis_of = np.full(self.n_nodes, -1, dtype=np.intp)
+        cut = np.zeros(self.n_nodes, dtype=np.intp)
+        for axis, (feature, grid) in enumerate(zip(features, grids)):
+            on_axis = ~is_leaf & (self.feature == feature)
+            axis_of[on_axis] = axis
+            cut[on_axis] = np.searchsorted(grid, self.threshold[on_axis], side='right')
+
+        n_out = 1 if average else X.shape[0]
+        diff = np.zeros((n_out, *(shape + 1)), dtype=np.float64)
+        corners = list(itertools.product((0, 1), repeat=len(grids)))
+
+        # One box per (row, tree) to start with, covering the whole grid
+        node = np.tile(self.roots, X.shape[0])
+        row = np.repeat(np.arange(X.shape[0]), self.n_trees)
+        lo = np.zeros((len(node), len(grids)), dtype=np.intp)
+        hi = np.repeat(shape[np.newaxis, :], len(node), axis=0)
+
+        while len(node):
+            leaf = is_leaf[node]
+            if leaf.any():
+                target = np.zeros(leaf.sum(), dtype=np.intp) if average else row[leaf]
+                for corner in corners:
+                    index = tuple(np.where(side, hi[leaf, axis], lo[leaf, axis])
+                                  for axis, side in enumerate(corner))
+                    sign = -1.0 if sum(corner) % 2 else 1.0
+                    np.add.at(diff, (target, *index), sign * value[node[leaf]])
+                node, row, lo, hi = node[~leaf], row[~leaf], lo[~leaf], hi[~leaf]
+
+            axis = axis_of[node]
+            swept = axis >= 0
+            goes_left = X[row, self.feature[node]] <= self.threshold[node]
+
+            # Left boxes end at the cut on swept axes, right boxes start there
+            left = np.flatnonzero(swept | goes_left)
+            right = np.flatnonzero(swept | ~goes_left)
+            left_hi = hi[left].copy()
+            split = swept[left]
+            left_hi[split, axis[left][split]] = np.minimum(
+                left_hi[split, axis[left][split]], cut[node[left]][split])
+            right_lo = lo[right].copy()
+            split = swept[right]
+            right_lo[split, axis[right][split]] = np.maximum(
+                right_lo[split, axis[right][split]], cut[node[right]][split])
+
+            node = np.concatenate([children[node[left], 0], children[node[right], 1]])
+            row = np.concatenate([row[left], row[right]])
+            lo = np.concatenate([lo[left], right_lo])
+            hi = np.concatenate([left_hi, hi[right]])
+
+            # Boxes cut down to nothing cover no grid point
+            keep = np.all(lo < hi, axis=1)
+            node, row, lo, hi = node[keep], row[keep], lo[keep], hi[keep]
+
+        for axis in range(len(grids)):
+            diff = np.cumsum(diff, axis=axis + 1)
+        proba = diff[(slice(None), *(slice(0, size) for size in shape))] / self.n_trees
+        return proba[0] / X.shape[0] if average else proba
+
+    def predict(self, X):
+        """Predicted class labels"""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def check_equivalence(model, engine, X):
+    """True when the flat engine reproduces model.predict_proba bit-for-bit
+
+    Only meaningful for finite X, see FlatForest.apply.
+    """
+    expected = model.predict_proba(X)
+    actual = engine.predict_proba(np.asarray(X))
+    return np.array_equal(expected, actual)
+
+
+if __name__ == "__main__":
+    import time
+    import joblib
+    import pandas as pd
+    from model_train import generate_synthetic_data
+
+    model = joblib.load('diabetes_model.pkl')
+    engine = FlatForest.from_model(model)
+    print(f"Flattened {engine.n_trees} trees, {engine.n_nodes} nodes, depth {engine.max_depth}")
+
+    datasets = {
+        'diabetes.csv': pd.read_csv('diabetes.csv').drop('Outcome', axis=1),
+        'synthetic': generate_synthetic_data(1000).drop('Outcome', axis=1),
+    }
+    for name, X in datasets.items():
+        print(f"{name}: bit-for-bit match = {check_equivalence(model, engine, X)}")
+
+    # Single-row latency, sklearn vs the flat engine
+    row_frame = datasets['diabetes.csv'].iloc[:1]
+    row = row_frame.to_numpy()
+    for label, fn in [("sklearn", lambda: model.predict_proba(row_frame)),
+                      ("flat", lambda: engine.predict_proba(row))]:
+        fn()
+        repeats = 200
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        elapsed = (time.perf_counter() - start) / repeats
+        print(f"{label:>8} single-row predict_proba: {elapsed * 1e6:8.1f} us")
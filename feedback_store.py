@@ -0,0 +1,210 @@
+"""Persistent feedback store with asynchronous batched writes
+
+submit() only puts the record on a bounded queue, so the Streamlit script
+thread never waits on disk. A background writer thread drains the queue
+in batches, one transaction per batch, into SQLite in WAL mode. SQLite's
+own fsync is turned off and the writer fsyncs the database and WAL every
+fsync_interval seconds instead, trading at most that much feedback on a
+power cut for much cheaper commits. When the queue is full submit() waits
+up to `timeout` and then raises FeedbackStoreFull. The store is closed at
+interpreter exit, so records still queued then are written too. A batch
+that fails is retried, then written row by row; records that still fail
+are counted in `dropped` and the feedback_dropped metric.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import registry
+
+FEEDBACK_DB_PATH = 'feedback.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    category TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    name TEXT,
+    email TEXT,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS feedback_created ON feedback (created_at);
+CREATE INDEX IF NOT EXISTS feedback_category ON feedback (category, created_at);
+CREATE INDEX IF NOT EXISTS feedback_priority ON feedback (priority, created_at);
+"""
+
+COLUMNS = ('created_at', 'category', 'priority', 'name', 'email', 'message')
+INSERT = f"INSERT INTO feedback ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)"
+
+# A batch that fails (e.g. the database is locked) is tried this many
+# times, waiting RETRY_DELAY seconds longer before each retry
+WRITE_ATTEMPTS = 3
+RETRY_DELAY = 0.1
+
+_STOP = object()
+
+
+class FeedbackStoreFull(Exception):
+    """The write queue stayed full for the whole submit timeout"""
+
+
+class FeedbackStore:
+    """SQLite feedback table fed by a background batching writer thread"""
+
+    def __init__(self, path=FEEDBACK_DB_PATH, max_queue=10_000, batch_size=500,
+                 flush_interval=0.05, fsync_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.written = 0
+        self.batches = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.close()
+
+        self._writer = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=OFF')
+        return connection
+
+    def submit(self, category, priority, message, name=None, email=None,
+               created_at=None, timeout=0.5):
+        """Queues one feedback record, raises FeedbackStoreFull under backpressure"""
+        record = (created_at if created_at is not None else time.time(),
+                  category, priority, name or None, email or None, message)
+        try:
+            self._queue.put(record, timeout=timeout)
+        except queue.Full:
+            self.rejected += 1
+            raise FeedbackStoreFull(f"Feedback queue full ({self._queue.maxsize} pending)")
+
+    def _run(self):
+        connection = self._connect()
+        last_fsync = time.monotonic()
+        stopping = False
+
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                batch.append(item)
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if _STOP in batch:
+                stopping = True
+            records = [item for item in batch if item is not _STOP]
+
+            if records:
+                written = self._write(connection, records)
+                self.written += written
+                self.batches += 1
+                if written < len(records):
+                    self.dropped += len(records) - written
+                    registry.increment("feedback_dropped", len(records) - written)
+
+            if stopping or time.monotonic() - last_fsync >= self.fsync_interval:
+                self._fsync()
+                last_fsync = time.monotonic()
+
+            for _ in batch:
+                self._queue.task_done()
+
+        connection.close()
+
+    def _write(self, connection, records):
+        """Inserts records in one transaction, returns how many were stored"""
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                with connection:
+                    connection.executemany(INSERT, records)
+                return len(records)
+            except sqlite3.IntegrityError:
+                # A bad record fails every retry, find it row by row instead
+                break
+            except sqlite3.Error:
+                time.sleep(RETRY_DELAY * (attempt + 1))
+
+        # One transaction per record so a bad one doesn't take the batch with it
+        written = 0
+        for record in records:
+            try:
+                with connection:
+                    connection.execute(INSERT, record)
+                written += 1
+            except sqlite3.Error:
+                pass
+        return written
+
+    def _fsync(self):
+        for path in (self.path, f"{self.path}-wal"):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def flush(self):
+        """Blocks until everything submitted so far is written"""
+        self._queue.join()
+
+    def close(self):
+        """Writes what is queued, fsyncs and stops the writer thread"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    def query(self, category=None, priority=None, since=None, until=None, limit=100):
+        """Newest-first feedback records matching the filters, as dicts
+
+        since/until are Unix timestamps. Filters hit the category, priority
+        and created_at indexes.
+        """
+        where, params = _where(category, priority, since, until)
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            rows = connection.execute(
+                f"SELECT id, {', '.join(COLUMNS)} FROM feedback {where} "
+                f"ORDER BY created_at DESC LIMIT ?", params + [limit]).fetchall()
+        finally:
+            connection.close()
+        return [dict(zip(('id',) + COLUMNS, row)) for row in rows]
+
+    def count(self, category=None, priority=None, since=None, until=None):
+        """Number of stored records matching the filters"""
+        where, params = _where(category, priority, since, until)
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            return connection.execute(f"SELECT COUNT(*) FROM feedback {where}", params).fetchone()[0]
+        finally:
+            connection.close()
+
+
+def _where(category, priority, since, until):
+    """SQL WHERE clause and parameters for the query filters"""
+    clauses, params = [], []
+    for clause, value in (('category = ?', category), ('priority = ?', priority),
+                          ('created_at >= ?', since), ('created_at < ?', until)):
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ''), params
@@ -0,0 +1,175 @@
+"""Parallel hyperparameter search for the forest with successive halving
+
+Candidate configurations (a full grid, or n_iter random draws from it) are
+scored with stratified k-fold cross-validation. Every (config, fold) fit is
+a separate task in a process pool. The training arrays are written once as
+.npy files and each worker memory-maps them, so workers share one copy of
+the data instead of receiving a pickled copy per task.
+
+Successive halving keeps the search cheap: all configs start on a small
+stratified sample of the rows, and only the best 1/eta go on to the next
+rung, which has eta times more rows. Configs that reach the full data are
+fitted once more on everything to record artifact size and single-row
+latency, so the fastest model above an accuracy floor can be chosen.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from fast_forest import FlatForest
+from model_train import build_model
+
+DEFAULT_GRID = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [4, 6, 8, 10, None],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+}
+
+# Arrays each worker process has memory-mapped, keyed by path
+_shared_arrays = {}
+
+
+def _load_shared(path):
+    if path not in _shared_arrays:
+        _shared_arrays[path] = np.load(path, mmap_mode='r')
+    return _shared_arrays[path]
+
+
+def candidate_configs(grid=DEFAULT_GRID, n_iter=None, seed=0):
+    """Every grid combination, or n_iter of them drawn at random"""
+    names = sorted(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if n_iter is not None and n_iter < len(configs):
+        configs = random.Random(seed).sample(configs, n_iter)
+    return configs
+
+
+def _fold_accuracy(task):
+    """Fits one config on one CV fold inside a worker, returns holdout accuracy"""
+    X_path, y_path, rows, train_index, test_index, params = task
+    X = _load_shared(X_path)[rows]
+    y = _load_shared(y_path)[rows]
+
+    model = build_model(n_jobs=1, **params)
+    model.fit(X[train_index], y[train_index])
+    return float(np.mean(model.predict(X[test_index]) == y[test_index]))
+
+
+def _profile_config(task):
+    """Fits one config on all rows and measures artifact size and single-row latency"""
+    X_path, y_path, params = task
+    X = _load_shared(X_path)
+    y = _load_shared(y_path)
+
+    engine = FlatForest.from_model(build_model(n_jobs=1, **params).fit(X, y))
+    row = np.asarray(X[:1])
+    engine.predict_proba(row)
+    samples = []
+    for _ in range(200):
+        start = time.perf_counter()
+        engine.predict_proba(row)
+        samples.append(time.perf_counter() - start)
+    return engine.nbytes, float(np.median(samples)) * 1e6
+
+
+def successive_halving(X, y, configs, folds=5, eta=3, min_rows=None, workers=None, seed=0):
+    """Runs the search, returns a list of result dicts for configs that reached full data"""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.ascontiguousarray(y)
+    workers = workers or os.cpu_count()
+
+    # Rung sizes grow by eta up to the full data set
+    n_rungs = max(1, int(np.ceil(np.log(max(len(configs), 1)) / np.log(eta))))
+    min_rows = min_rows or max(folds * 20, len(X) // eta ** (n_rungs - 1))
+
+    with tempfile.TemporaryDirectory() as directory, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        X_path = os.path.join(directory, 'X.npy')
+        y_path = os.path.join(directory, 'y.npy')
+        np.save(X_path, X)
+        np.save(y_path, y)
+
+        survivors = list(configs)
+        history = []
+        for rung in range(n_rungs):
+            n_rows = len(X) if rung == n_rungs - 1 else min(len(X), min_rows * eta ** rung)
+            if n_rows < len(X):
+                rows, _ = train_test_split(np.arange(len(X)), train_size=n_rows,
+                                           stratify=y, random_state=seed)
+                rows = np.sort(rows)
+            else:
+                rows = np.arange(len(X))
+
+            splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+            splits = list(splitter.split(rows, y[rows]))
+            tasks = [(X_path, y_path, rows, train_index, test_index, params)
+                     for params in survivors for train_index, test_index in splits]
+            accuracies = np.array(list(pool.map(_fold_accuracy, tasks))).reshape(len(survivors), folds)
+
+            scored = []
+            for params, fold_scores in zip(survivors, accuracies):
+                result = {'params': params, 'rung': rung, 'rows': int(n_rows),
+                          'accuracy': float(fold_scores.mean()), 'accuracy_std': float(fold_scores.std())}
+                scored.append(result)
+                history.append(result)
+            print(f"rung {rung}: {len(survivors)} configs on {n_rows:,} rows, "
+                  f"best accuracy {max(r['accuracy'] for r in scored):.3f}", flush=True)
+
+            if rung < n_rungs - 1:
+                scored.sort(key=lambda r: r['accuracy'], reverse=True)
+                survivors = [r['params'] for r in scored[:max(1, len(scored) // eta)]]
+
+        finalists = [r for r in history if r['rung'] == n_rungs - 1]
+        profiles = pool.map(_profile_config, [(X_path, y_path, r['params']) for r in finalists])
+        for result, (size_bytes, latency_us) in zip(finalists, profiles):
+            result['model_bytes'] = int(size_bytes)
+            result['latency_us'] = latency_us
+
+    return finalists
+
+
+def fastest_above_floor(results, accuracy_floor):
+    """The lowest-latency result whose CV accuracy meets the floor, or None"""
+    eligible = [r for r in results if r['accuracy'] >= accuracy_floor]
+    return min(eligible, key=lambda r: r['latency_us']) if eligible else None
+
+
+if __name__ == "__main__":
+    from preprocessing import load_dataset
+
+    parser = argparse.ArgumentParser(description="Search forest hyperparameters with successive halving")
+    parser.add_argument('--data', default='diabetes.csv')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--n-iter', type=int, default=None, help="random configs instead of the full grid")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--accuracy-floor', type=float, default=0.75)
+    parser.add_argument('--output', default=None, help="write all finalist results as JSON")
+    args = parser.parse_args()
+
+    X, y, _ = load_dataset(args.data)
+    configs = candidate_configs(n_iter=args.n_iter)
+    results = successive_halving(X, y, configs, args.folds, args.eta, workers=args.workers)
+
+    print(f"\n{'accuracy':>9} {'size KB':>9} {'latency us':>11}  params")
+    for r in sorted(results, key=lambda r: r['accuracy'], reverse=True):
+        print(f"{r['accuracy']:>9.3f} {r['model_bytes'] / 1024:>9.0f} {r['latency_us']:>11.1f}  {r['params']}")
+
+    best = fastest_above_floor(results, args.accuracy_floor)
+    if best is None:
+        print(f"\nNo finalist reached the accuracy floor of {args.accuracy_floor:.3f}")
+    else:
+        print(f"\nFastest config with accuracy >= {args.accuracy_floor:.3f}: {best['params']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
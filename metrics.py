@@ -0,0 +1,194 @@
+"""In-process timing spans, latency histograms and an on-demand profiler
+
+    with span('score'):
+        ...
+
+Every span lands in a per-stage histogram with fixed log-spaced buckets,
+so recording is a bisect and an increment regardless of traffic. The
+registry renders the Prometheus text format, for a /metrics endpoint or a
+metrics file that node_exporter's textfile collector can pick up.
+
+Setting DIABETES_PROFILE_REQUESTS=N profiles the next N requests with
+cProfile and writes the combined stats to DIABETES_PROFILE_PATH.
+"""
+import bisect
+import cProfile
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# 10 us .. ~60 s, four buckets per power of ten
+BUCKET_BOUNDS = [10 ** (exponent / 4) for exponent in range(-20, 8)]
+
+METRICS_FILE = os.environ.get("DIABETES_METRICS_FILE", "metrics.prom")
+PROFILE_PATH = os.environ.get("DIABETES_PROFILE_PATH", "profile.pstats")
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, Prometheus style"""
+
+    def __init__(self, bounds=BUCKET_BOUNDS):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimated quantile, interpolated linearly inside the bucket"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class MetricsRegistry:
+    """Thread-safe collection of stage histograms and event counters"""
+
+    def __init__(self, prefix='diabetes'):
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, event, amount=1):
+        with self._lock:
+            self.counters[event] = self.counters.get(event, 0) + amount
+
+    @contextmanager
+    def span(self, stage):
+        """Times the enclosed block into the stage's histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def summary(self):
+        """{stage: {count, mean, p50, p95, p99}} in seconds"""
+        with self._lock:
+            return {
+                stage: {
+                    'count': histogram.count,
+                    'mean': histogram.total / histogram.count if histogram.count else 0.0,
+                    'p50': histogram.quantile(0.50),
+                    'p95': histogram.quantile(0.95),
+                    'p99': histogram.quantile(0.99),
+                }
+                for stage, histogram in self.histograms.items()
+            }
+
+    def render_prometheus(self):
+        """Prometheus text exposition of every histogram and counter"""
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Wall-clock time per assessment stage",
+                 f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.9f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+            quantile_name = f"{self.prefix}_stage_quantile_seconds"
+            lines += [f"# HELP {quantile_name} Estimated latency quantiles per stage",
+                      f"# TYPE {quantile_name} gauge"]
+            for stage, histogram in sorted(self.histograms.items()):
+                for q in (0.5, 0.95, 0.99):
+                    lines.append(f'{quantile_name}{{stage="{stage}",quantile="{q}"}} '
+                                 f'{histogram.quantile(q):.9f}')
+
+            counter_name = f"{self.prefix}_events_total"
+            lines += [f"# HELP {counter_name} Event counters",
+                      f"# TYPE {counter_name} counter"]
+            for event, value in sorted(self.counters.items()):
+                lines.append(f'{counter_name}{{event="{event}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path=METRICS_FILE):
+        """Writes the Prometheus text atomically so scrapers never see half a file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def write_file_every(self, interval, path=METRICS_FILE):
+        """write_file(), skipped if the last write was under interval seconds ago"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_write < interval:
+                return
+            self._last_write = now
+        self.write_file(path)
+
+
+class RequestProfiler:
+    """cProfile switched on for the next N requests, then dumped to a .pstats file"""
+
+    def __init__(self, requests=0, path=PROFILE_PATH):
+        self.remaining = requests
+        self.path = path
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def enable(self, requests):
+        with self._lock:
+            self.remaining = requests
+
+    @contextmanager
+    def request(self):
+        """Profiles the enclosed request if the profiler still has budget"""
+        with self._lock:
+            active = self.remaining > 0
+            if active:
+                self.remaining -= 1
+        if not active:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running on this thread
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profiler)
+                else:
+                    self._stats.add(profiler)
+                self._stats.dump_stats(self.path)
+
+
+registry = MetricsRegistry()
+profiler = RequestProfiler(int(os.environ.get("DIABETES_PROFILE_REQUESTS", "0")))
+span = registry.span
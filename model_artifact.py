@@ -0,0 +1,252 @@
+"""Pickle-free model artifact: a JSON header followed by flat numeric arrays
+
+Layout of a .dfm file:
+    8 bytes   magic b"DFOREST\\0"
+    4 bytes   little-endian uint32 header length
+    N bytes   UTF-8 JSON header (format version, metadata, array table)
+    ...       raw little-endian arrays, each starting on a 64-byte boundary
+
+Loading memory-maps the file read-only, so every worker process that opens
+the same artifact shares one copy of the pages through the OS page cache.
+"""
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from fast_forest import FlatForest
+
+COMPACT_MODEL_PATH = 'diabetes_model.dfm'
+# Smaller forest written by model_compression.py
+COMPRESSED_MODEL_PATH = 'diabetes_model.compressed.dfm'
+PICKLE_MODEL_PATH = 'diabetes_model.pkl'
+
+MAGIC = b"DFOREST\0"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Arrays stored in the file and the on-disk dtype of each. Thresholds and
+# leaf values stay float64 so scores match the sklearn model exactly.
+ARRAY_DTYPES = {
+    'feature': '<i4',
+    'threshold': '<f8',
+    'children': '<i4',
+    'value': '<f8',
+    'roots': '<i4',
+}
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_forest(engine, path, metadata=None):
+    """Writes a FlatForest to path, replacing any existing file atomically"""
+    arrays = {name: np.ascontiguousarray(getattr(engine, name), dtype=dtype)
+              for name, dtype in ARRAY_DTYPES.items()}
+
+    # Offsets are relative to the end of the header, which is itself padded
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _aligned(offset)
+        table[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'max_depth': engine.max_depth,
+        'classes': np.asarray(engine.classes_).tolist(),
+        'feature_names': engine.feature_names,
+        'imputed_medians': getattr(engine, 'imputed_medians', None),
+        'metadata': metadata or {},
+        'arrays': table,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 4 + len(header_bytes))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + table[name]['offset'])
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    """Returns (header dict, byte offset where the array data starts)"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a compact forest artifact")
+        (header_length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version {header.get('format_version')}, "
+                         f"expected {FORMAT_VERSION}")
+    return header, _aligned(len(MAGIC) + 4 + header_length)
+
+
+def load_forest(path):
+    """Memory-maps a .dfm artifact and returns a FlatForest over its pages"""
+    header, data_start = read_header(path)
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        start = data_start + spec['offset']
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                     offset=start).reshape(spec['shape'])
+
+    return FlatForest(
+        feature=arrays['feature'],
+        threshold=arrays['threshold'],
+        children=arrays['children'],
+        value=arrays['value'],
+        roots=arrays['roots'],
+        max_depth=header['max_depth'],
+        classes=np.asarray(header['classes']),
+        feature_names=header['feature_names'],
+        # Artifacts written before the header key kept the medians in metadata only
+        imputed_medians=header.get('imputed_medians') or header['metadata'].get('imputed_medians'),
+        source_version=header['metadata'].get('source_version'),
+    )
+
+
+def export_model(model, path, metadata=None):
+    """Flattens a fitted sklearn forest and writes it as a .dfm artifact"""
+    save_forest(FlatForest.from_model(model), path, metadata)
+
+
+def artifact_version(path):
+    """Short content hash identifying a model artifact"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def load_engine(compact_path=COMPACT_MODEL_PATH, pickle_path=PICKLE_MODEL_PATH):
+    """Scoring engine from the compact artifact, falling back to the joblib pickle"""
+    if os.path.exists(compact_path):
+        return load_forest(compact_path)
+
+    import joblib
+    return FlatForest.from_model(joblib.load(pickle_path))
+
+
+def _file_token(path):
+    """(path, mtime, size, inode) of path, None when there is no such file"""
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (path, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class ReloadingEngine:
+    """Scoring engine that switches to a republished artifact without a restart
+
+    The artifact's mtime/size/inode is checked at most every check_interval
+    seconds. A changed file is loaded in full before the reference is
+    swapped, and artifacts are replaced by rename, so requests already
+    scoring on the old memory map finish on it undisturbed.
+
+    With a loader, compact_path is an artifact derived from the forest at
+    source_path (quantized forest, risk table, compressed forest) and is
+    loaded with loader(path). Both files are watched, and while the derived
+    artifact's source_version is not the source's current version, e.g.
+    right after a retrain, the source forest is served instead of a stale
+    derivative. The source forest also stands in when the derived artifact
+    is missing or cannot be loaded. served_path is the file actually
+    scoring and fallback_reason says why it is not compact_path.
+    """
+
+    def __init__(self, compact_path=COMPACT_MODEL_PATH, pickle_path=PICKLE_MODEL_PATH,
+                 check_interval=1.0, loader=None, source_path=None):
+        self.compact_path = compact_path
+        self.pickle_path = pickle_path
+        self.check_interval = check_interval
+        self.loader = loader
+        self.source_path = source_path
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._token = self._read_token()
+        self._engine, self.served_path, self.fallback_reason = self._load()
+        self._next_check = time.monotonic() + check_interval
+
+    def _read_token(self):
+        served = _file_token(self.compact_path) or _file_token(self.pickle_path)
+        return served, _file_token(self.source_path)
+
+    def _load(self):
+        """(engine, path it was loaded from, why that is not compact_path or None)"""
+        if self.loader is None:
+            served = self.compact_path if os.path.exists(self.compact_path) else self.pickle_path
+            return load_engine(self.compact_path, self.pickle_path), served, None
+
+        if self.source_path is None or not os.path.exists(self.source_path):
+            return self.loader(self.compact_path), self.compact_path, None
+        if not os.path.exists(self.compact_path):
+            return load_forest(self.source_path), self.source_path, "is missing"
+        try:
+            engine = self.loader(self.compact_path)
+        except (OSError, ValueError) as e:
+            return load_forest(self.source_path), self.source_path, f"could not be loaded ({e})"
+        if getattr(engine, 'source_version', None) != artifact_version(self.source_path):
+            return load_forest(self.source_path), self.source_path, "was built from an older model"
+        return engine, self.compact_path, None
+
+    @property
+    def stale(self):
+        """True while the source forest stands in for the derived artifact"""
+        return self.fallback_reason is not None
+
+    @property
+    def engine(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._next_check = now + self.check_interval
+                    token = self._read_token()
+                    if token != self._token:
+                        self._engine, self.served_path, self.fallback_reason = self._load()
+                        self._token = token
+                        self.reloads += 1
+        return self._engine
+
+    @property
+    def classes_(self):
+        return self.engine.classes_
+
+    @property
+    def imputed_medians(self):
+        return self.engine.imputed_medians
+
+    def predict_proba(self, X):
+        return self.engine.predict_proba(X)
+
+    def predict(self, X):
+        return self.engine.predict(X)
+
+
+if __name__ == "__main__":
+    import joblib
+
+    export_model(joblib.load(PICKLE_MODEL_PATH), COMPACT_MODEL_PATH)
+    print(f"Wrote '{COMPACT_MODEL_PATH}' ({os.path.getsize(COMPACT_MODEL_PATH):,} bytes)")
@@ -0,0 +1,216 @@
+"""Shrinking the published forest while it keeps agreeing with the original
+
+Two strategies, both judged on held-out reference rows by label agreement
+with the original risk_score > threshold decision:
+
+    prune    greedy backward elimination of whole trees. Per-tree positive
+             probabilities are computed once from the flat node arrays,
+             so every candidate removal is a vectorised subtraction.
+    distill  small student forests (few, shallow trees) fitted on the
+             original model's labels for real plus generated rows, tried
+             from cheapest to largest until one agrees well enough.
+
+The smallest result that meets the target is written as a .dfm artifact
+to COMPRESSED_MODEL_PATH. The app serves it with
+DIABETES_MODEL_VARIANT=compressed.
+"""
+import argparse
+import copy
+import os
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+from fast_forest import FlatForest
+from model_artifact import COMPRESSED_MODEL_PATH, PICKLE_MODEL_PATH, load_forest, save_forest
+from scoring import DEFAULT_THRESHOLD, _positive_column
+
+# Student forests tried by distill(), cheapest first. Every split considers
+# all features, students copy one function rather than generalise from data
+STUDENT_CONFIGS = [
+    {'n_estimators': n_estimators, 'max_depth': max_depth, 'max_features': None}
+    for max_depth in (4, 6, 8, 10)
+    for n_estimators in (5, 10, 20, 40)
+]
+
+
+def agreement(reference_scores, scores, threshold=DEFAULT_THRESHOLD):
+    """Fraction of rows where both risk scores land on the same side of threshold"""
+    return float(np.mean((reference_scores > threshold) == (scores > threshold)))
+
+
+def tree_scores(engine, X):
+    """Positive-class probability of every tree for every row, shape (trees, rows)"""
+    column = _positive_column(engine)
+    leaves = engine.apply(X)
+    return np.ascontiguousarray(engine.value[leaves, column].T)
+
+
+def subset_forest(model, tree_indices):
+    """Copy of a fitted sklearn forest keeping only the given trees"""
+    subset = copy.copy(model)
+    subset.estimators_ = [model.estimators_[i] for i in tree_indices]
+    subset.n_estimators = len(subset.estimators_)
+    return subset
+
+
+def prune(model, X_reference, target=0.99, threshold=DEFAULT_THRESHOLD):
+    """Drops trees one at a time while label agreement stays >= target
+
+    Returns the list of tree indices to keep.
+    """
+    per_tree = tree_scores(FlatForest.from_model(model), X_reference)
+    reference = per_tree.mean(axis=0)
+    reference_labels = reference > threshold
+
+    keep = list(range(len(per_tree)))
+    total = per_tree.sum(axis=0)
+    while len(keep) > 1:
+        remaining = per_tree[keep]
+        # Scores of every forest that is missing exactly one of the kept trees
+        candidates = (total[np.newaxis, :] - remaining) / (len(keep) - 1)
+        agreements = np.mean((candidates > threshold) == reference_labels, axis=1)
+        errors = np.mean(np.abs(candidates - reference), axis=1)
+        # Best agreement first, the smallest probability drift breaks ties
+        best = np.lexsort((errors, -agreements))[0]
+        if agreements[best] < target:
+            break
+        total -= remaining[best]
+        del keep[best]
+    return keep
+
+
+def distill(model, X_reference, X_transfer, target=0.99, threshold=DEFAULT_THRESHOLD,
+            configs=STUDENT_CONFIGS, seed=42):
+    """First student forest, cheapest first, whose labels agree >= target on X_reference
+
+    Students learn the original model's labels on X_transfer. Returns the
+    fitted student, or None when no config is good enough.
+    """
+    column = _positive_column(model)
+    teacher = FlatForest.from_model(model)
+    transfer_labels = (teacher.predict_proba(X_transfer)[:, column] > threshold).astype(np.int64)
+    reference_scores = teacher.predict_proba(X_reference)[:, column]
+
+    for params in configs:
+        student = RandomForestClassifier(random_state=seed, **params).fit(X_transfer, transfer_labels)
+        if len(student.classes_) < 2:
+            continue
+        scores = FlatForest.from_model(student).predict_proba(X_reference)[:, _positive_column(student)]
+        if agreement(reference_scores, scores, threshold) >= target:
+            return student
+    return None
+
+
+def profile_artifact(path, row, repeats=500):
+    """(file bytes, load ms, single-row predict_proba us) of a .dfm artifact"""
+    start = time.perf_counter()
+    engine = load_forest(path)
+    load_ms = (time.perf_counter() - start) * 1e3
+
+    engine.predict_proba(row)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        engine.predict_proba(row)
+    latency_us = (time.perf_counter() - start) / repeats * 1e6
+    return os.path.getsize(path), load_ms, latency_us
+
+
+def compress_model(model, X_reference, X_transfer=None, target=0.99, threshold=DEFAULT_THRESHOLD,
+                   method='both', path=COMPRESSED_MODEL_PATH, source_version=None):
+    """Writes the smallest forest meeting the agreement target to path
+
+    method is 'prune', 'distill' or 'both'. source_version, the
+    artifact_version of the model's .dfm, is recorded so serving can tell
+    when the compressed forest belongs to an older model. Returns (engine,
+    metadata), or (None, None) when nothing smaller than the original
+    qualifies.
+    """
+    if method not in ('prune', 'distill', 'both'):
+        raise ValueError(f"method must be 'prune', 'distill' or 'both', got '{method}'")
+
+    original = FlatForest.from_model(model)
+    reference_scores = original.predict_proba(X_reference)[:, _positive_column(model)]
+
+    candidates = []
+    if method in ('prune', 'both'):
+        keep = prune(model, X_reference, target, threshold)
+        candidates.append(('prune', FlatForest.from_model(subset_forest(model, keep)),
+                           {'trees_kept': keep}))
+    if method in ('distill', 'both'):
+        student = distill(model, X_reference, X_reference if X_transfer is None else X_transfer,
+                          target, threshold)
+        if student is not None:
+            candidates.append(('distill', FlatForest.from_model(student),
+                               {'student_params': {'n_estimators': student.n_estimators,
+                                                   'max_depth': student.max_depth}}))
+
+    candidates = [c for c in candidates if c[1].nbytes < original.nbytes]
+    if not candidates:
+        return None, None
+
+    name, engine, details = min(candidates, key=lambda c: c[1].nbytes)
+    # Students learned the original's cleaned inputs, so they score after the same imputation
+    engine.imputed_medians = original.imputed_medians
+    scores = engine.predict_proba(X_reference)[:, _positive_column(engine)]
+    metadata = dict(details, method=name, target_agreement=target, threshold=threshold,
+                    agreement=agreement(reference_scores, scores, threshold),
+                    mean_abs_score_diff=float(np.mean(np.abs(scores - reference_scores))),
+                    reference_rows=len(reference_scores), source_version=source_version)
+    engine.source_version = source_version
+    save_forest(engine, path, metadata)
+    return engine, metadata
+
+
+def reference_rows(data_path='diabetes.csv', synthetic_rows=20_000, transfer_rows=100_000, seed=7):
+    """(reference rows, transfer rows) for judging and distilling a compressed model
+
+    Reference rows are the 20% test split model_train.py holds out plus
+    generated patients. Transfer rows are the training split plus a
+    different, non-overlapping range of generated patients, so students
+    see the teacher's behaviour away from the few hundred real rows.
+    """
+    from preprocessing import load_dataset
+    from synthetic_data import generate_rows
+
+    X, y, _ = load_dataset(data_path)
+    X_train, X_test = train_test_split(np.asarray(X), test_size=0.2, random_state=42, stratify=y)
+    generated = generate_rows(0, synthetic_rows + transfer_rows, seed)
+    generated = generated.drop('Outcome', axis=1).to_numpy(np.float32)
+    return (np.concatenate([X_test, generated[:synthetic_rows]]),
+            np.concatenate([X_train, generated[synthetic_rows:]]))
+
+
+if __name__ == "__main__":
+    import joblib
+    from model_artifact import COMPACT_MODEL_PATH, artifact_version, export_model
+
+    parser = argparse.ArgumentParser(description="Compress the published forest")
+    parser.add_argument('--target', type=float, default=0.99,
+                        help="minimum label agreement with the original on held-out rows")
+    parser.add_argument('--method', choices=['prune', 'distill', 'both'], default='both')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--data', default='diabetes.csv')
+    parser.add_argument('--model', default=PICKLE_MODEL_PATH)
+    parser.add_argument('--output', default=COMPRESSED_MODEL_PATH)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    X_reference, X_transfer = reference_rows(args.data)
+
+    if not os.path.exists(COMPACT_MODEL_PATH):
+        export_model(model, COMPACT_MODEL_PATH)
+    engine, metadata = compress_model(model, X_reference, X_transfer, args.target, args.threshold,
+                                      args.method, args.output, artifact_version(COMPACT_MODEL_PATH))
+    if engine is None:
+        print(f"No forest smaller than the original reaches {args.target:.2%} agreement")
+        raise SystemExit(1)
+    row = X_reference[:1]
+    print(f"{metadata['method']}: {engine.n_trees} trees, {engine.n_nodes:,} nodes, "
+          f"agreement {metadata['agreement']:.2%} on {metadata['reference_rows']:,} rows")
+    print(f"\n{'artifact':<12} {'size KB':>9} {'load ms':>9} {'row us':>9}")
+    for label, path in (('original', COMPACT_MODEL_PATH), ('compressed', args.output)):
+        size, load_ms, latency_us = profile_artifact(path, row)
+        print(f"{label:<12} {size / 1024:>9.0f} {load_ms:>9.2f} {latency_us:>9.1f}")
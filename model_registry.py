@@ -0,0 +1,314 @@
+"""Local registry of versioned model artifacts, with promotion and shadow scoring
+
+    models/
+        <version>/model.dfm, model.pkl, meta.json
+        production.json, candidate.json      which version each stage serves
+
+A version is the content hash of its .dfm artifact, the same id the app
+logs with every assessment. Registering writes the version directory
+under a temporary name and renames it into place. Promoting copies the
+version's files next to the stage's served paths and moves them over
+with os.replace, so the swap is atomic. Served files are copies rather
+than links, so writing to one can never change a registered version.
+ReloadingEngine in every worker notices the new file on its next check
+and switches over between requests.
+
+Artifacts derived from the production forest follow a promotion: the
+quantized forest and the drift reference are rebuilt from the new one, a
+risk table or compressed forest is reported as stale (ReloadingEngine
+serves the full forest in their place until they are rebuilt).
+
+ShadowScorer scores traffic with the candidate stage on a background
+thread, off the response path, and tracks how often it disagrees with the
+production decision and how much slower or faster it is.
+"""
+import argparse
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from drift_monitor import DRIFT_REFERENCE_PATH, build_model_reference, load_reference, save_reference
+from metrics import registry as metrics_registry
+from model_artifact import (COMPACT_MODEL_PATH, COMPRESSED_MODEL_PATH, PICKLE_MODEL_PATH,
+                            ReloadingEngine, artifact_version, export_model, load_forest)
+from quantized_forest import QUANTIZED_MODEL_PATH, QuantizedForest
+from risk_table import RISK_TABLE_PATH
+from scoring import DEFAULT_THRESHOLD, FEATURE_NAMES, score_batch
+
+REGISTRY_DIR = 'models'
+
+CANDIDATE_MODEL_PATH = 'diabetes_model.candidate.dfm'
+CANDIDATE_PICKLE_PATH = 'diabetes_model.candidate.pkl'
+CANDIDATE_COMPRESSED_PATH = 'diabetes_model.candidate.compressed.dfm'
+
+# Served (pickle, compact artifact) paths of each stage
+STAGE_PATHS = {
+    'production': (PICKLE_MODEL_PATH, COMPACT_MODEL_PATH),
+    'candidate': (CANDIDATE_PICKLE_PATH, CANDIDATE_MODEL_PATH),
+}
+
+# Compressed forest written from each stage's model, so compressing a
+# candidate never replaces the one served alongside production
+STAGE_COMPRESSED_PATHS = {
+    'production': COMPRESSED_MODEL_PATH,
+    'candidate': CANDIDATE_COMPRESSED_PATH,
+}
+
+
+def _install(source, destination):
+    """Atomically replaces destination with a copy of source"""
+    tmp_path = f"{destination}.tmp"
+    shutil.copyfile(source, tmp_path)
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, destination)
+
+
+def refresh_derived(compact_path, version):
+    """Brings the artifacts derived from the production forest up to version
+
+    Quantizing is exact and takes milliseconds, so a quantized forest
+    beside compact_path is rebuilt with its previous settings, and the
+    drift reference is rescored from the rows it was built on. Tabulating
+    and compressing can fail or need reference data, those artifacts are
+    only reported. Prints and returns the paths left stale.
+    """
+    directory = os.path.dirname(compact_path)
+    stale = []
+    quantized_path = os.path.join(directory, QUANTIZED_MODEL_PATH)
+    if os.path.exists(quantized_path):
+        previous = QuantizedForest.load(quantized_path)
+        try:
+            quantized = QuantizedForest.from_forest(
+                load_forest(compact_path), 'float32' if previous.scales is None else 'int16',
+                str(previous.value.dtype), source_version=version)
+        except ValueError:
+            stale.append(quantized_path)
+        else:
+            quantized.save(quantized_path)
+
+    drift_path = os.path.join(directory, DRIFT_REFERENCE_PATH)
+    if os.path.exists(drift_path):
+        try:
+            save_reference(build_model_reference(load_reference(drift_path)['data'], compact_path),
+                           drift_path)
+        except (OSError, KeyError, ValueError):
+            # Built before references recorded their rows, or the rows are gone
+            stale.append(drift_path)
+
+    for name in (RISK_TABLE_PATH, COMPRESSED_MODEL_PATH):
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            stale.append(path)
+    for path in stale:
+        print(f"'{path}' was built from an older model and is stale until it is rebuilt")
+    return stale
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """Versioned model artifacts on local disk"""
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def register(self, model, metadata=None):
+        """Stores a fitted forest as a new version, returns the version id
+
+        metadata (metrics, training data hash, ...) is kept in meta.json and
+        in the artifact header. Registering the same model twice is a no-op.
+        """
+        import joblib
+
+        staging = os.path.join(self.root, f".staging-{os.getpid()}-{time.time_ns()}")
+        os.makedirs(staging)
+        try:
+            export_model(model, os.path.join(staging, 'model.dfm'), metadata=metadata)
+            version = artifact_version(os.path.join(staging, 'model.dfm'))
+            joblib.dump(model, os.path.join(staging, 'model.pkl'))
+            _write_json(os.path.join(staging, 'meta.json'),
+                        {'version': version, 'created_at': time.time(), 'metadata': metadata or {}})
+
+            destination = os.path.join(self.root, version)
+            if os.path.exists(destination):
+                shutil.rmtree(staging)
+            else:
+                os.rename(staging, destination)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return version
+
+    def versions(self):
+        """meta.json contents of every registered version, oldest first"""
+        entries = []
+        for name in os.listdir(self.root):
+            meta_path = os.path.join(self.root, name, 'meta.json')
+            if not name.startswith('.') and os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    entries.append(json.load(f))
+        return sorted(entries, key=lambda entry: entry['created_at'])
+
+    def stage(self, stage):
+        """Version currently promoted to stage, or None"""
+        try:
+            with open(os.path.join(self.root, f"{stage}.json")) as f:
+                return json.load(f)['version']
+        except FileNotFoundError:
+            return None
+
+    def promote(self, version, stage='production', paths=None):
+        """Serves version as stage by atomically replacing the stage's files
+
+        paths overrides the stage's (pickle, compact) paths. The pickle goes
+        first, the compact artifact that workers watch last. Promoting to
+        production also refreshes the derived artifacts, see
+        refresh_derived(). Returns the derived artifacts left stale.
+        """
+        if stage not in STAGE_PATHS:
+            raise ValueError(f"Unknown stage '{stage}', expected one of {', '.join(STAGE_PATHS)}")
+        directory = os.path.join(self.root, version)
+        if not os.path.exists(os.path.join(directory, 'model.dfm')):
+            raise KeyError(f"No registered version '{version}'")
+
+        pickle_path, compact_path = paths or STAGE_PATHS[stage]
+        _install(os.path.join(directory, 'model.pkl'), pickle_path)
+        _install(os.path.join(directory, 'model.dfm'), compact_path)
+        _write_json(os.path.join(self.root, f"{stage}.json"),
+                    {'version': version, 'promoted_at': time.time()})
+        return refresh_derived(compact_path, version) if stage == 'production' else []
+
+
+class ShadowScorer:
+    """Scores requests with a candidate model in the background and compares
+
+    submit() only queues the rows with the production scores and latency,
+    dropping them when the queue is full, so the response path never waits
+    on the candidate. Disagreements and latencies also go to the metrics
+    registry (shadow_* counters, shadow_score stage).
+    """
+
+    def __init__(self, candidate, threshold=DEFAULT_THRESHOLD, max_queue=10_000, batch_size=256):
+        self.candidate = candidate
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.rows = 0
+        self.disagreements = 0
+        self.dropped = 0
+        self.score_diff_total = 0.0
+        self.primary_seconds = 0.0
+        self.candidate_seconds = 0.0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._worker = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def for_candidate(cls, compact_path=CANDIDATE_MODEL_PATH, pickle_path=CANDIDATE_PICKLE_PATH,
+                      **kwargs):
+        """Shadow scorer following the candidate stage, hot-reloaded like production"""
+        return cls(ReloadingEngine(compact_path, pickle_path), **kwargs)
+
+    def submit(self, rows, risk_scores, seconds):
+        """Queues rows scored by production in `seconds`, never blocks"""
+        try:
+            self._queue.put_nowait((rows, risk_scores, seconds))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            metrics_registry.increment("shadow_dropped")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = np.concatenate([np.asarray(r, dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+                                   for r, _, _ in batch])
+            primary = np.concatenate([np.atleast_1d(np.asarray(s, dtype=np.float64))
+                                      for _, s, _ in batch])
+            try:
+                start = time.perf_counter()
+                _, candidate = score_batch(self.candidate, rows, self.threshold)
+                elapsed = time.perf_counter() - start
+            except Exception:
+                # A broken candidate must not take the worker down
+                metrics_registry.increment("shadow_errors")
+                candidate = None
+
+            if candidate is not None:
+                disagreements = int(np.sum((primary > self.threshold) != (candidate > self.threshold)))
+                with self._lock:
+                    self.rows += len(rows)
+                    self.disagreements += disagreements
+                    self.score_diff_total += float(np.sum(np.abs(primary - candidate)))
+                    self.primary_seconds += sum(seconds for _, _, seconds in batch)
+                    self.candidate_seconds += elapsed
+                metrics_registry.observe("shadow_score", elapsed)
+                metrics_registry.increment("shadow_rows", len(rows))
+                metrics_registry.increment("shadow_disagreements", disagreements)
+
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Blocks until everything submitted so far has been shadow scored"""
+        self._queue.join()
+
+    def stats(self):
+        """Disagreement rate, mean score difference and latencies per row in ms
+
+        The candidate scores queued requests in batches, so its latency is
+        the batch time spread over the rows in it.
+        """
+        with self._lock:
+            rows = max(self.rows, 1)
+            return {
+                'rows': self.rows,
+                'dropped': self.dropped,
+                'disagreement_rate': self.disagreements / rows,
+                'mean_abs_score_diff': self.score_diff_total / rows,
+                'primary_ms': self.primary_seconds / rows * 1e3,
+                'candidate_ms': self.candidate_seconds / rows * 1e3,
+                'latency_delta_ms': (self.candidate_seconds - self.primary_seconds) / rows * 1e3,
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and promote registered models")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="registered versions and the stages serving them")
+    promote = commands.add_parser('promote', help="serve a version as production or candidate")
+    promote.add_argument('version')
+    promote.add_argument('--stage', choices=sorted(STAGE_PATHS), default='production')
+    args = parser.parse_args()
+
+    model_registry = ModelRegistry()
+    if args.command == 'list':
+        serving = {model_registry.stage(stage): stage for stage in STAGE_PATHS}
+        for entry in model_registry.versions():
+            metadata = entry['metadata']
+            created = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['created_at']))
+            accuracy = metadata.get('accuracy')
+            print(f"{entry['version']}  {created}  "
+                  f"accuracy {accuracy if accuracy is None else f'{accuracy:.3f}'}  "
+                  f"{serving.get(entry['version'], '')}")
+    else:
+        model_registry.promote(args.version, args.stage)
+        print(f"Version {args.version} now serving as {args.stage}")
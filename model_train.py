@@ -5,82 +5,118 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
-
-def generate_synthetic_data(n_samples=1000):
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from model_registry import REGISTRY_DIR, STAGE_COMPRESSED_PATHS, STAGE_PATHS, ModelRegistry
+from synthetic_data import generate_rows
+from preprocessing import file_hash, fill_missing, impute_missing, load_dataset
+from scoring import FEATURE_NAMES
+
+# Hyperparameters used for the shipped model
+MODEL_PARAMS = {
+    'n_estimators': 100,
+    'random_state': 42,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+}
+
+def generate_synthetic_data(n_samples=1000, seed=42):
     """Generates synthetic diabetes dataset for training purposes"""
-    np.random.seed(42)
-
-    
-    pregnancies = np.random.poisson(2, n_samples)
-    glucose = np.random.normal(120, 30, n_samples)
-    blood_pressure = np.random.normal(80, 15, n_samples)
-    skin_thickness = np.random.normal(20, 10, n_samples)
-    insulin = np.random.normal(80, 40, n_samples)
-    bmi = np.random.normal(25, 5, n_samples)
-    diabetes_pedigree = np.random.gamma(0.5, 1, n_samples)
-    age = np.random.normal(35, 15, n_samples)
-
-    
-    pregnancies = np.clip(pregnancies, 0, 17)
-    glucose = np.clip(glucose, 50, 300)
-    blood_pressure = np.clip(blood_pressure, 40, 180)
-    skin_thickness = np.clip(skin_thickness, 0, 100)
-    insulin = np.clip(insulin, 0, 900)
-    bmi = np.clip(bmi, 15, 70)
-    diabetes_pedigree = np.clip(diabetes_pedigree, 0, 3)
-    age = np.clip(age, 18, 120)
+    # Block-seeded generator, see synthetic_data.py for chunked/parallel output
+    return generate_rows(0, n_samples, seed)
 
-    
-    diabetes_risk = (
-        0.1 * (glucose > 125) +
-        0.08 * (bmi > 30) +
-        0.06 * (age > 45) +
-        0.05 * (blood_pressure > 90) +
-        0.04 * diabetes_pedigree +
-        0.03 * (pregnancies > 3) +
-        np.random.normal(0, 0.1, n_samples)
-    )
-
-    outcome = (diabetes_risk > 0.3).astype(int)
+def build_model(n_jobs=-1, **overrides):
+    """Returns an unfitted forest, n_jobs=-1 builds trees on every core"""
+    params = dict(MODEL_PARAMS, **overrides)
+    return RandomForestClassifier(n_jobs=n_jobs, **params)
 
-    
-    data = pd.DataFrame({
-        'Pregnancies': pregnancies,
-        'Glucose': glucose,
-        'BloodPressure': blood_pressure,
-        'SkinThickness': skin_thickness,
-        'Insulin': insulin,
-        'BMI': bmi,
-        'DiabetesPedigreeFunction': diabetes_pedigree,
-        'Age': age,
-        'Outcome': outcome
-    })
-
-    return data
-
-def train_and_save_model():
-    """Trains the diabetes prediction model and saves it"""
+def split_data(data):
+    """Stratified 80/20 train/test split of a dataset with an Outcome column"""
+    X = data.drop('Outcome', axis=1)
+    y = data['Outcome']
 
-    
-    data = generate_synthetic_data(1000)
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+def publish_model(model, model_path='diabetes_model.pkl', compact_path='diabetes_model.dfm',
+                  metadata=None, stage='production', registry_root=None):
+    """Registers model as a new version and promotes it
+
+    Promoting to production atomically replaces the pickle and compact
+    artifacts at model_path/compact_path. Running app workers and the
+    scoring service watch the compact artifact and switch to the new model
+    on their next request. stage='candidate' installs it for shadow
+    scoring next to model_path instead and leaves production alone. The
+    registry lives in a models/ directory beside model_path unless
+    registry_root says otherwise, so models published elsewhere (e.g. by
+    a benchmark) never touch the app's registry.
+    """
+    # Single-row scoring is faster without a thread pool, and it keeps the
+    # per-tree summation order fixed for the flat engine
+    model.set_params(n_jobs=None)
+    # Scoring applies the same imputation to raw inputs, see scoring.prepare_rows
+    if metadata and metadata.get('imputed_medians'):
+        model.imputed_medians = metadata['imputed_medians']
+
+    directory = os.path.dirname(model_path)
+    if registry_root is None:
+        registry_root = os.path.join(directory, REGISTRY_DIR)
+    if stage == 'production':
+        paths = (model_path, compact_path)
+    else:
+        paths = tuple(os.path.join(directory, path) for path in STAGE_PATHS[stage])
+
+    registry = ModelRegistry(registry_root)
+    version = registry.register(model, metadata)
+    registry.promote(version, stage, paths)
+    print(f"\nModel version {version} registered and promoted to {stage}")
+    return version
+
+def load_training_data(data_path=None, n_samples=1000):
+    """Features and labels from a real CSV (raw, cached) or synthetic data"""
+    if data_path is None:
+        data = generate_synthetic_data(n_samples)
+        return data.drop('Outcome', axis=1), data['Outcome'], {'n_samples': n_samples}
+
+    X, y, _ = load_dataset(data_path, impute=False)
+    # Column names keep the feature names in the fitted model and artifacts
+    source = {'data': data_path, 'data_sha256': file_hash(data_path)}
+    return pd.DataFrame(X, columns=FEATURE_NAMES), y, source
+
+def impute_split(X_train, X_test):
+    """Imputes both splits with medians of the training split, returns (X_train, X_test, medians)
+
+    The held-out rows are cleaned like any later input, so no statistic of
+    theirs reaches the training data.
+    """
+    train = X_train.to_numpy(dtype=np.float32, copy=True)
+    medians = impute_missing(train)
+    test = fill_missing(X_test.to_numpy(dtype=np.float32, copy=True), medians)
+    return (pd.DataFrame(train, columns=FEATURE_NAMES, index=X_train.index),
+            pd.DataFrame(test, columns=FEATURE_NAMES, index=X_test.index), medians)
+
+def train_and_save_model(n_samples=1000, n_jobs=-1, model_path='diabetes_model.pkl',
+                         compact_path='diabetes_model.dfm', data_path=None, stage='production'):
+    """Trains the diabetes prediction model and saves it
+
+    With data_path the model is trained on that CSV (e.g. diabetes.csv),
+    otherwise on n_samples synthetic rows.
+    """
 
     
-    X = data.drop('Outcome', axis=1)
-    y = data['Outcome']
+    X, y, source = load_training_data(data_path, n_samples)
 
     
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
+    if data_path is not None:
+        X_train, X_test, source['imputed_medians'] = impute_split(X_train, X_test)
 
     
-    model = RandomForestClassifier(
-        n_estimators=100,
-        random_state=42,
-        max_depth=10,
-        min_samples_split=5,
-        min_samples_leaf=2
-    )
+    model = build_model(n_jobs=n_jobs)
 
     model.fit(X_train, y_train)
 
@@ -92,11 +128,122 @@ def train_and_save_model():
     print("\nClassification Report:")
     print(classification_report(y_test, y_pred))
 
-    
-    joblib.dump(model, 'diabetes_model.pkl')
-    print("\nModel saved as 'diabetes_model.pkl'")
+    publish_model(model, model_path, compact_path, metadata=dict(source, accuracy=accuracy), stage=stage)
 
     return model
 
+def _fit_variant(args):
+    """Fits one hyperparameter variant single-threaded, runs inside a worker process"""
+    params, n_samples = args
+    data = generate_synthetic_data(n_samples)
+    X_train, X_test, y_train, y_test = split_data(data)
+
+    model = build_model(n_jobs=1, **params)
+    model.fit(X_train, y_train)
+    return params, accuracy_score(y_test, model.predict(X_test))
+
+def train_variants(param_variants, n_samples=1000, max_workers=None):
+    """Fits several hyperparameter variants side by side in a process pool
+
+    Each variant gets one core, which scales better than n_jobs when there
+    are at least as many variants as cores. Returns [(params, accuracy)].
+    """
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_fit_variant, [(params, n_samples) for params in param_variants]))
+
+def retrain_incremental(new_data, model_path='diabetes_model.pkl', compact_path='diabetes_model.dfm',
+                        trees_per_chunk=20, max_trees=100, retire='oldest', n_jobs=-1):
+    """Adds trees fitted on a newly arrived data chunk to the published forest
+
+    Existing trees are kept as they are (warm_start), so the cost depends on
+    the size of new_data, not on all the data seen so far. Once the forest
+    is over max_trees the oldest trees, or with retire='weakest' the trees
+    least accurate on the new chunk's holdout, are dropped. The result is
+    published atomically. Returns a dict with rows, fit seconds and trees.
+    """
+    if retire not in ('oldest', 'weakest'):
+        raise ValueError(f"retire must be 'oldest' or 'weakest', got '{retire}'")
+
+    model = joblib.load(model_path)
+    # New rows are raw, clean them the way the existing trees' data was
+    medians = getattr(model, 'imputed_medians', None)
+    if medians:
+        new_data = new_data.copy()
+        for name, median in medians.items():
+            new_data[name] = new_data[name].mask(new_data[name] == 0, median)
+    X_train, X_test, y_train, y_test = split_data(new_data)
+    if set(y_train) != set(model.classes_):
+        raise ValueError("New data must contain every outcome class the model was trained on")
+
+    # After retiring, the forest is back to the same size each chunk, so a
+    # fixed random_state would hand the new trees the last chunk's seeds.
+    # Each chunk draws from its own stream, keyed on a counter kept in the model
+    chunk = getattr(model, 'incremental_chunks_', 0) + 1
+    random_state = int(np.random.SeedSequence([MODEL_PARAMS['random_state'], chunk]).generate_state(1)[0])
+
+    start = time.perf_counter()
+    model.set_params(warm_start=True, n_jobs=n_jobs, random_state=random_state,
+                     n_estimators=len(model.estimators_) + trees_per_chunk)
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    excess = len(model.estimators_) - max_trees
+    if excess > 0:
+        if retire == 'oldest':
+            keep = list(range(excess, len(model.estimators_)))
+        else:
+            # Trees were fitted on numpy arrays, so score them the same way
+            X_holdout = X_test.to_numpy()
+            tree_accuracy = [accuracy_score(y_test, model.classes_.take(tree.predict(X_holdout).astype(int)))
+                             for tree in model.estimators_]
+            keep = sorted(np.argsort(tree_accuracy, kind='stable')[excess:])
+        model.estimators_ = [model.estimators_[i] for i in keep]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    model.incremental_chunks_ = chunk
+
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    print(f"Added {trees_per_chunk} trees on {len(new_data):,} new rows in {fit_seconds:.2f}s, "
+          f"forest now {len(model.estimators_)} trees, holdout accuracy {accuracy:.3f}")
+    publish_model(model, model_path, compact_path,
+                  metadata={'accuracy': accuracy, 'incremental_rows': len(new_data),
+                            'imputed_medians': medians})
+
+    return {'rows': len(new_data), 'fit_seconds': fit_seconds, 'trees': len(model.estimators_)}
+
 if __name__ == "__main__":
-    train_and_save_model()
+    parser = argparse.ArgumentParser(description="Train and save the diabetes model")
+    parser.add_argument('--data', default='diabetes.csv', help="labelled CSV to train on")
+    parser.add_argument('--synthetic', action='store_true', help="train on generated data instead")
+    parser.add_argument('--samples', type=int, default=1000, help="synthetic rows to train on")
+    parser.add_argument('--jobs', type=int, default=-1, help="cores for tree building, -1 for all")
+    parser.add_argument('--incremental', metavar='CSV',
+                        help="add trees fitted on this new labelled data instead of retraining")
+    parser.add_argument('--trees-per-chunk', type=int, default=20)
+    parser.add_argument('--max-trees', type=int, default=100)
+    parser.add_argument('--retire', choices=['oldest', 'weakest'], default='oldest')
+    parser.add_argument('--stage', choices=['production', 'candidate'], default='production',
+                        help="candidate models are shadow scored instead of served")
+    parser.add_argument('--compress', type=float, metavar='AGREEMENT',
+                        help="also write a compressed model agreeing this often with the full one")
+    args = parser.parse_args()
+
+    if args.incremental:
+        retrain_incremental(pd.read_csv(args.incremental), trees_per_chunk=args.trees_per_chunk,
+                            max_trees=args.max_trees, retire=args.retire, n_jobs=args.jobs)
+    else:
+        model = train_and_save_model(n_samples=args.samples, n_jobs=args.jobs,
+                                     data_path=None if args.synthetic else args.data, stage=args.stage)
+        if args.compress:
+            from model_artifact import artifact_version
+            from model_compression import compress_model, reference_rows
+            # Tagged with the version just published, so it is only served alongside it
+            compressed_path = STAGE_COMPRESSED_PATHS[args.stage]
+            engine, metadata = compress_model(model, *reference_rows(args.data), target=args.compress,
+                                              path=compressed_path,
+                                              source_version=artifact_version(STAGE_PATHS[args.stage][1]))
+            if engine is None:
+                print(f"No smaller forest reaches {args.compress:.2%} agreement, nothing compressed")
+            else:
+                print(f"Compressed model ({metadata['method']}, {engine.n_trees} trees, "
+                      f"{metadata['agreement']:.2%} agreement) saved as '{compressed_path}'")
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from scoring import DEFAULT_THRESHOLD, Score, score_batch
+
+
+def cache_key(row):
+    """Normalised key for an 8-feature row
+
+    The trees compare float32 inputs, so rows that round to the same float32
+    vector always get the same score and can share a cache entry.
+    """
+    return np.asarray(row, dtype=np.float32).tobytes()
+
+
+class PredictionCache:
+    """Bounded LRU cache of risk scores with a TTL
+
+    Entries are dropped when the model artifact on disk changes (checked at
+    most every check_interval seconds), so a retrained model is never
+    answered from stale scores. artifact_path may be a tuple of paths, a
+    change to any of them clears the cache. Safe to share between
+    Streamlit sessions.
+    """
+
+    def __init__(self, max_size=10_000, ttl=300.0, artifact_path=None, check_interval=1.0,
+                 clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.artifact_path = artifact_path
+        self.check_interval = check_interval
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._artifact_token = self._read_artifact_token()
+        self._next_check = clock() + check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _read_artifact_token(self):
+        if self.artifact_path is None:
+            return None
+        paths = self.artifact_path if isinstance(self.artifact_path, tuple) else (self.artifact_path,)
+        token = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                token.append(None)
+                continue
+            token.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return tuple(token)
+
+    def _check_artifact(self, now):
+        if self.artifact_path is None or now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        token = self._read_artifact_token()
+        if token != self._artifact_token:
+            self._artifact_token = token
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get(self, key):
+        """Cached risk score for key, or None"""
+        with self._lock:
+            now = self._clock()
+            self._check_artifact(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            risk_score, expires_at = entry
+            if now >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return risk_score
+
+    def put(self, key, risk_score):
+        with self._lock:
+            self._entries[key] = (risk_score, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def score(self, model, row, threshold=DEFAULT_THRESHOLD):
+        """scoring.score() with the forest skipped for rows seen recently"""
+        key = cache_key(row)
+        risk_score = self.get(key)
+        if risk_score is None:
+            _, risk_scores = score_batch(model, [row], threshold)
+            risk_score = float(risk_scores[0])
+            self.put(key, risk_score)
+        return Score(int(risk_score > threshold), risk_score, threshold)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
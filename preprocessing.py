@@ -0,0 +1,111 @@
+"""Loading and cleaning real diabetes CSVs, with an on-disk cache
+
+The CSV is parsed with explicit compact dtypes. PIMA records 0 where
+Glucose, BloodPressure, SkinThickness, Insulin or BMI were not measured,
+and those zeros are replaced by the column median of the measured values.
+Training takes the raw arrays instead (impute=False) and computes the
+medians on its training split only. The arrays are saved under CACHE_DIR keyed by a hash of the file
+contents, so later runs memory-map them instead of parsing the CSV again.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURE_NAMES
+
+CACHE_DIR = '.cache'
+
+# Bump when the cleaning steps change so stale caches are not reused
+PIPELINE_VERSION = 1
+
+CSV_DTYPES = {
+    'Pregnancies': np.uint8,
+    'Glucose': np.float32,
+    'BloodPressure': np.float32,
+    'SkinThickness': np.float32,
+    'Insulin': np.float32,
+    'BMI': np.float32,
+    'DiabetesPedigreeFunction': np.float32,
+    'Age': np.float32,
+    'Outcome': np.uint8,
+}
+
+ZERO_MEANS_MISSING = ['Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI']
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def impute_missing(X, columns=ZERO_MEANS_MISSING):
+    """Replaces zeros with the median of the non-zero values, in place
+
+    X is a float32 (rows, features) array in FEATURE_NAMES order. Returns
+    the medians used, {column: median}.
+    """
+    medians = {}
+    for name in columns:
+        measured = X[:, FEATURE_NAMES.index(name)]
+        measured = measured[measured != 0]
+        medians[name] = float(np.float32(np.median(measured))) if len(measured) else 0.0
+    fill_missing(X, medians)
+    return medians
+
+
+def fill_missing(X, medians):
+    """Replaces zeros with the given {column: median}, in place, and returns X"""
+    for name, median in medians.items():
+        column = X[:, FEATURE_NAMES.index(name)]
+        column[column == 0] = median
+    return X
+
+
+def read_csv(path):
+    """Parses the CSV into (X float32 (rows, 8), y uint8) without any cleaning"""
+    frame = pd.read_csv(path, dtype=CSV_DTYPES, usecols=FEATURE_NAMES + ['Outcome'], engine='c')
+    X = frame[FEATURE_NAMES].to_numpy(dtype=np.float32)
+    y = frame['Outcome'].to_numpy()
+    return X, y
+
+
+def load_dataset(path='diabetes.csv', cache_dir=CACHE_DIR, use_cache=True, impute=True):
+    """Cleaned (X, y, medians) for a diabetes CSV, from the cache when possible
+
+    With impute=False X is left raw and medians is None. Cached arrays come
+    back memory-mapped read-only.
+    """
+    key = f"{file_hash(path)[:16]}-v{PIPELINE_VERSION}{'' if impute else '-raw'}"
+    X_path = os.path.join(cache_dir, f"{key}-X.npy")
+    y_path = os.path.join(cache_dir, f"{key}-y.npy")
+    medians_path = os.path.join(cache_dir, f"{key}-medians.json")
+
+    paths = (X_path, y_path, medians_path) if impute else (X_path, y_path)
+    if use_cache and all(os.path.exists(p) for p in paths):
+        medians = None
+        if impute:
+            with open(medians_path) as f:
+                medians = json.load(f)
+        return np.load(X_path, mmap_mode='r'), np.load(y_path, mmap_mode='r'), medians
+
+    X, y = read_csv(path)
+    medians = impute_missing(X) if impute else None
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write under temporary names first so a crash never leaves half a cache entry
+        for final_path, array in ((X_path, X), (y_path, y)):
+            np.save(f"{final_path}.tmp.npy", array)
+            os.replace(f"{final_path}.tmp.npy", final_path)
+        if impute:
+            with open(f"{medians_path}.tmp", 'w') as f:
+                json.dump(medians, f)
+            os.replace(f"{medians_path}.tmp", medians_path)
+
+    return X, y, medians
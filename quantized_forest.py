@@ -0,0 +1,331 @@
+"""Quantized forest: the flat engine's node arrays in the narrowest types that hold them
+
+Per node the flat engine keeps an 8-byte feature index, a float64
+threshold, two 8-byte child indices and two float64 class probabilities,
+48 bytes. Eight features, trees of a few hundred nodes and clinical
+inputs at a fixed granularity (whole numbers, BMI to 0.1, pedigree to
+0.001) need far less, so the quantized forest keeps
+
+    feature     uint8
+    threshold   float32, or int16 in units of the feature's step; leaves
+                get the lowest value so no input ever goes left at a leaf
+    child       uint8/uint16 offset to the right child, sklearn puts the
+                left child right after its parent and a leaf has offset 0
+    value       diabetic-class probability as uint16 (or float32)
+
+6 to 11 bytes per node, small enough for the whole forest to stay in L2
+cache. float32 thresholds are rounded down, which sends any input exactly
+where the float64 ones do. int16 thresholds are snapped to the feature's
+steps and only take inputs at that granularity (what the form and
+diabetes.csv give), anything between steps is rejected rather than
+rounded. Only the uint16 leaf values are approximate, by at most 1/131070.
+
+    python quantized_forest.py --data diabetes.csv
+
+quantizes diabetes_model.dfm, proves label agreement with
+diabetes_model.pkl on the raw dataset, reports memory and latency, and
+only then writes the quantized model. It records the version of the
+.dfm it came from: serving falls back to the full forest whenever that
+is no longer the published one, and promoting a new model rebuilds it
+(see model_registry.refresh_derived).
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from fast_forest import BLOCK_ROWS
+from scoring import DEFAULT_THRESHOLD, FEATURE_NAMES, _positive_column, prepare_rows, score_batch
+
+QUANTIZED_MODEL_PATH = 'diabetes_model.quantized.npz'
+
+# Input steps per feature, inputs are stored as multiples of 1 / scale
+FEATURE_SCALES = {
+    'Pregnancies': 1,
+    'Glucose': 1,
+    'BloodPressure': 1,
+    'SkinThickness': 1,
+    'Insulin': 1,
+    'BMI': 10,
+    'DiabetesPedigreeFunction': 1000,
+    'Age': 1,
+}
+
+UINT16_MAX = np.iinfo(np.uint16).max
+INT16 = np.iinfo(np.int16)
+
+
+def _snap_thresholds(threshold, scale):
+    """Largest k with float32(k / scale) <= threshold, for each threshold
+
+    An input at step k goes left exactly when k <= the snapped threshold.
+    """
+    k = np.floor(threshold * scale)
+    # floor() of the product can be one step off either way after rounding
+    for _ in range(2):
+        k -= (k / scale).astype(np.float32) > threshold
+        k += ((k + 1) / scale).astype(np.float32) <= threshold
+    return np.clip(k, INT16.min, INT16.max).astype(np.int16)
+
+
+def _float32_thresholds(threshold):
+    """Largest float32 <= threshold, the float64 comparison for any float32 input"""
+    rounded = threshold.astype(np.float32)
+    too_high = rounded > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+class QuantizedForest:
+    """Binary forest over narrow node arrays, scored like FlatForest"""
+
+    def __init__(self, feature, threshold, right, value, roots, max_depth, classes, scales,
+                 value_scale, imputed_medians=None, source_version=None):
+        self.feature = feature          # split feature per node, uint8
+        self.threshold = threshold      # int16 steps of the feature, or float32
+        self.right = right              # offset to the right child, 0 on leaves
+        self.value = value              # diabetic-class probability per node
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.scales = scales            # step scale per feature, None for float32 thresholds
+        self.value_scale = value_scale  # stored value / value_scale is the probability
+        self.imputed_medians = imputed_medians
+        self.source_version = source_version  # version of the .dfm it was quantized from
+
+    @classmethod
+    def from_forest(cls, forest, threshold_dtype='float32', value_dtype='uint16',
+                    scales=FEATURE_SCALES, source_version=None):
+        """Quantizes a FlatForest, raises ValueError when its layout can't be packed
+
+        source_version is the artifact_version of the .dfm forest came from,
+        serving checks it to never score with a quantized copy of an old model.
+        """
+        if len(forest.classes_) != 2:
+            raise ValueError("Only binary forests can be quantized")
+
+        n_nodes = forest.n_nodes
+        children = forest.children.reshape(-1, 2)
+        own_index = np.arange(n_nodes)
+        is_leaf = children[:, 0] == own_index
+        if np.any(children[~is_leaf, 0] != own_index[~is_leaf] + 1):
+            raise ValueError("Left children must directly follow their parent")
+        right = np.where(is_leaf, 0, children[:, 1] - own_index)
+        if right.max() > UINT16_MAX or n_nodes > UINT16_MAX:
+            raise ValueError("Trees too large for 16-bit node offsets")
+
+        if threshold_dtype == 'int16':
+            names = forest.feature_names or FEATURE_NAMES
+            scale = np.array([scales[name] for name in names], dtype=np.float64)
+            threshold = np.full(n_nodes, INT16.min, dtype=np.int16)
+            for f, feature_scale in enumerate(scale):
+                on_feature = ~is_leaf & (forest.feature == f)
+                threshold[on_feature] = _snap_thresholds(forest.threshold[on_feature], feature_scale)
+        elif threshold_dtype == 'float32':
+            scale = None
+            threshold = np.where(is_leaf, np.float32(-np.inf), _float32_thresholds(forest.threshold))
+        else:
+            raise ValueError(f"threshold_dtype must be 'int16' or 'float32', got '{threshold_dtype}'")
+
+        positive = forest.value[:, _positive_column(forest)]
+        if value_dtype == 'uint16':
+            value_scale = float(UINT16_MAX)
+            value = np.rint(positive * value_scale).astype(np.uint16)
+        elif value_dtype == 'float32':
+            value_scale = 1.0
+            value = positive.astype(np.float32)
+        else:
+            raise ValueError(f"value_dtype must be 'uint16' or 'float32', got '{value_dtype}'")
+
+        return cls(
+            feature=forest.feature.astype(np.uint8),
+            threshold=threshold,
+            right=right.astype(np.uint8 if right.max() <= np.iinfo(np.uint8).max else np.uint16),
+            value=value,
+            roots=forest.roots.astype(np.uint16),
+            max_depth=forest.max_depth,
+            classes=forest.classes_,
+            scales=scale,
+            value_scale=value_scale,
+            imputed_medians=forest.imputed_medians,
+            source_version=source_version,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        """Memory held by the node arrays"""
+        return sum(array.nbytes for array in (self.feature, self.threshold, self.right,
+                                              self.value, self.roots))
+
+    def quantize(self, X):
+        """Inputs in the thresholds' representation, steps of each feature or float32"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if self.scales is None:
+            return X
+        scales = self.scales.astype(np.float32)
+        steps = np.rint(X * scales)
+        # Snapping an input between steps could send it the wrong way at a split
+        if np.any(steps / scales != X):
+            raise ValueError("Inputs are not at their feature's granularity, "
+                             "int16 thresholds need whole steps (use float32 thresholds)")
+        # INT16.min is the leaves' threshold, no input may reach it
+        return np.clip(steps, INT16.min + 1, INT16.max).astype(np.int16)
+
+    def apply(self, X):
+        """Returns the leaf index reached in every tree, shape (rows, trees)"""
+        return self._walk(self.quantize(X))
+
+    def _walk(self, X):
+        """Leaf indices for inputs already quantized"""
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_offset = (np.arange(X.shape[0]) * X.shape[1])[:, np.newaxis]
+        node = np.repeat(self.roots.astype(np.intp)[np.newaxis, :], X.shape[0], axis=0)
+        for _ in range(self.max_depth):
+            goes_left = flat_X.take(row_offset + self.feature.take(node)) <= self.threshold.take(node)
+            # Left is the next node. Leaves have offset 0 and a threshold no
+            # input is below, so they always take their 0 offset and stay put
+            next_node = node + np.where(goes_left, 1, self.right.take(node))
+            if np.array_equal(next_node, node):
+                break
+            node = next_node
+        return node
+
+    def predict_proba(self, X):
+        """Class probabilities from the quantized leaf values"""
+        X = self.quantize(X)
+        positive = np.empty(X.shape[0], dtype=np.float64)
+        accumulator = np.int64 if self.value.dtype == np.uint16 else np.float64
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves = self._walk(X[start:start + BLOCK_ROWS])
+            positive[start:start + BLOCK_ROWS] = self.value[leaves].sum(axis=1, dtype=accumulator)
+        positive /= self.value_scale * self.n_trees
+
+        proba = np.empty((X.shape[0], 2), dtype=np.float64)
+        column = _positive_column(self)
+        proba[:, column] = positive
+        proba[:, 1 - column] = 1.0 - positive
+        return proba
+
+    def predict(self, X):
+        """Predicted class labels"""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def save(self, path=QUANTIZED_MODEL_PATH):
+        # np.savez adds .npz to names without it, so write to a name that has it
+        tmp_path = f"{path}.tmp.npz"
+        arrays = {'feature': self.feature, 'threshold': self.threshold, 'right': self.right,
+                  'value': self.value, 'roots': self.roots, 'classes': self.classes_,
+                  'max_depth': np.array(self.max_depth),
+                  'value_scale': np.array(self.value_scale)}
+        if self.scales is not None:
+            arrays['scales'] = self.scales
+        if self.imputed_medians:
+            arrays['imputed_medians'] = np.array(json.dumps(self.imputed_medians))
+        if self.source_version:
+            arrays['source_version'] = np.array(self.source_version)
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=QUANTIZED_MODEL_PATH):
+        with np.load(path) as data:
+            return cls(feature=data['feature'], threshold=data['threshold'], right=data['right'],
+                       value=data['value'], roots=data['roots'], max_depth=int(data['max_depth']),
+                       classes=data['classes'],
+                       scales=data['scales'] if 'scales' in data else None,
+                       value_scale=float(data['value_scale']),
+                       imputed_medians=(json.loads(str(data['imputed_medians']))
+                                        if 'imputed_medians' in data else None),
+                       source_version=str(data['source_version']) if 'source_version' in data else None)
+
+
+def sklearn_nbytes(model):
+    """Memory of the fitted sklearn trees' node and value arrays"""
+    total = 0
+    for estimator in model.estimators_:
+        state = estimator.tree_.__getstate__()
+        total += state['nodes'].nbytes + state['values'].nbytes
+    return total
+
+
+def l2_cache_bytes():
+    """L2 cache size of the first CPU from sysfs, None when unavailable"""
+    for index in range(8):
+        base = f"/sys/devices/system/cpu/cpu0/cache/index{index}"
+        try:
+            with open(f"{base}/level") as f:
+                level = f.read().strip()
+            with open(f"{base}/size") as f:
+                size = f.read().strip()
+        except OSError:
+            continue
+        if level == '2':
+            units = {'K': 1 << 10, 'M': 1 << 20}
+            return int(size[:-1]) * units[size[-1]] if size[-1] in units else int(size)
+    return None
+
+
+if __name__ == "__main__":
+    import joblib
+    from benchmarks.suite import fastest
+    from model_artifact import COMPACT_MODEL_PATH, PICKLE_MODEL_PATH, artifact_version, load_forest
+    from preprocessing import read_csv
+
+    parser = argparse.ArgumentParser(description="Quantize the trained forest and prove it agrees")
+    parser.add_argument('--model', default=PICKLE_MODEL_PATH, help="sklearn model to agree with")
+    parser.add_argument('--source', default=COMPACT_MODEL_PATH, help="published forest to quantize")
+    parser.add_argument('--data', default='diabetes.csv')
+    parser.add_argument('--threshold-dtype', choices=['float32', 'int16'], default='float32',
+                        help="int16 only accepts inputs at each feature's granularity")
+    parser.add_argument('--value-dtype', choices=['uint16', 'float32'], default='uint16')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="decision threshold the labels are compared at")
+    parser.add_argument('--output', default=QUANTIZED_MODEL_PATH)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    # Single-row scoring is faster without a thread pool, as published
+    model.set_params(n_jobs=None)
+    flat = load_forest(args.source)
+    quantized = QuantizedForest.from_forest(flat, args.threshold_dtype, args.value_dtype,
+                                            source_version=artifact_version(args.source))
+
+    # The raw CSV, blanks recorded as zeros, through the same path requests take
+    X_raw, _ = read_csv(args.data)
+    expected_labels, expected = score_batch(model, X_raw, args.threshold)
+    actual_labels, actual = score_batch(quantized, X_raw, args.threshold)
+    X = prepare_rows(flat, X_raw)
+    same_leaves = np.array_equal(flat.apply(X), quantized.apply(X))
+    disagreements = int(np.sum(expected_labels != actual_labels))
+    print(f"{len(X):,} raw rows of {args.data}: identical leaves {same_leaves}, "
+          f"label disagreements {disagreements}, max risk score difference "
+          f"{np.abs(expected - actual).max():.2e}")
+
+    l2 = l2_cache_bytes()
+    print(f"\n{'representation':<16} {'memory KB':>10} {'row us':>9} {'10k rows ms':>12}")
+    batch = np.tile(X, (10_000 // len(X) + 1, 1))[:10_000]
+    for label, engine, nbytes in (('sklearn', model, sklearn_nbytes(model)),
+                                  ('flat', flat, flat.nbytes),
+                                  ('quantized', quantized, quantized.nbytes)):
+        row_us = fastest(lambda: engine.predict_proba(X[:1]), 300) * 1e6
+        batch_ms = fastest(lambda: engine.predict_proba(batch), 10) * 1e3
+        print(f"{label:<16} {nbytes / 1024:>10.0f} {row_us:>9.1f} {batch_ms:>12.1f}")
+    if l2:
+        print(f"\nL2 cache: {l2 / 1024:.0f} KB, quantized forest uses {quantized.nbytes / l2:.0%} of it")
+
+    if disagreements or not same_leaves:
+        print("\nNot written, the quantized forest does not agree with the model")
+        raise SystemExit(1)
+    quantized.save(args.output)
+    print(f"\nQuantized model written to '{args.output}'")
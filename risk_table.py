@@ -0,0 +1,155 @@
+"""Tabulated scoring: the forest's output precomputed over its own split grid
+
+A forest is a step function: its output only changes where some tree
+splits. For each feature the table keeps the sorted distinct thresholds the
+trees use, and for every cell of the resulting grid the forest's class
+probabilities. Scoring is then one binary search per feature plus a table
+read, and gives exactly the probabilities the forest would.
+
+The grid has prod(len(thresholds) + 1) cells, so this only fits forests
+that split each feature at a modest number of places, e.g. compressed or
+shallow forests. Building refuses anything over max_cells.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+RISK_TABLE_PATH = 'diabetes_model.table.npz'
+DEFAULT_MAX_CELLS = 1 << 24
+BUILD_BATCH_ROWS = 1 << 16
+
+
+def split_thresholds(engine):
+    """Sorted distinct thresholds per feature, over the forest's internal nodes"""
+    internal = engine.children[0::2] != np.arange(engine.n_nodes)
+    n_features = len(engine.feature_names) if engine.feature_names else int(engine.feature.max()) + 1
+    return [np.unique(engine.threshold[internal & (engine.feature == f)]) for f in range(n_features)]
+
+
+def _bin_representatives(thresholds):
+    """A float32 input value inside each bin (t[i-1], t[i]] plus one above the last threshold"""
+    values = []
+    for threshold in thresholds:
+        value = np.float32(threshold)
+        if value > threshold:
+            value = np.nextafter(value, np.float32(-np.inf))
+        values.append(value)
+
+    above = np.float32(thresholds[-1]) if len(thresholds) else np.float32(0.0)
+    if len(thresholds) and above <= thresholds[-1]:
+        above = np.nextafter(above, np.float32(np.inf))
+    values.append(above)
+    return np.array(values, dtype=np.float32)
+
+
+def table_cells(engine):
+    """Number of cells a full table for engine would need"""
+    return int(np.prod([len(t) + 1 for t in split_thresholds(engine)], dtype=object))
+
+
+class RiskTable:
+    """Interval index over the forest's split thresholds with a probability table"""
+
+    def __init__(self, thresholds, table, classes, imputed_medians=None, source_version=None):
+        self.thresholds = thresholds
+        self.table = table
+        self.classes_ = classes
+        self.imputed_medians = imputed_medians
+        self.source_version = source_version  # version of the .dfm the table was built from
+        self.shape = tuple(len(t) + 1 for t in thresholds)
+
+    @classmethod
+    def build(cls, engine, max_cells=DEFAULT_MAX_CELLS, source_version=None):
+        thresholds = split_thresholds(engine)
+        shape = tuple(len(t) + 1 for t in thresholds)
+        cells = int(np.prod(shape, dtype=object))
+        if cells > max_cells:
+            raise ValueError(f"Forest needs a {cells:.3g}-cell table ({' x '.join(map(str, shape))}), "
+                             f"over the max_cells budget of {max_cells:,}")
+
+        representatives = [_bin_representatives(t) for t in thresholds]
+        table = np.empty((cells, len(engine.classes_)), dtype=np.float64)
+        for start in range(0, cells, BUILD_BATCH_ROWS):
+            index = np.unravel_index(np.arange(start, min(start + BUILD_BATCH_ROWS, cells)), shape)
+            grid = np.column_stack([values[i] for values, i in zip(representatives, index)])
+            table[start:start + len(grid)] = engine.predict_proba(grid)
+        return cls(thresholds, table, np.asarray(engine.classes_),
+                   getattr(engine, 'imputed_medians', None), source_version)
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes + sum(t.nbytes for t in self.thresholds)
+
+    def cell_index(self, X):
+        """Flat table index for each row, one binary search per feature"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        # The trees send x <= threshold left, so bin i holds t[i-1] < x <= t[i]
+        bins = [np.searchsorted(t, X[:, f], side='left') for f, t in enumerate(self.thresholds)]
+        return np.ravel_multi_index(bins, self.shape)
+
+    def predict_proba(self, X):
+        return self.table[self.cell_index(X)]
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def save(self, path):
+        arrays = {f"thresholds_{f}": t for f, t in enumerate(self.thresholds)}
+        if self.imputed_medians:
+            arrays['imputed_medians'] = np.array(json.dumps(self.imputed_medians))
+        if self.source_version:
+            arrays['source_version'] = np.array(self.source_version)
+        # Written under a temporary name and renamed, serving reloads the file when it changes
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, table=self.table, classes=self.classes_, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            n_features = sum(1 for name in data.files if name.startswith('thresholds_'))
+            thresholds = [data[f"thresholds_{f}"] for f in range(n_features)]
+            medians = json.loads(str(data['imputed_medians'])) if 'imputed_medians' in data else None
+            source_version = str(data['source_version']) if 'source_version' in data else None
+            return cls(thresholds, data['table'], data['classes'], medians, source_version)
+
+
+def verify(engine, table, X):
+    """True when the table reproduces engine.predict_proba exactly on X"""
+    return np.array_equal(engine.predict_proba(X), table.predict_proba(X))
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from model_artifact import COMPACT_MODEL_PATH, artifact_version, load_engine
+
+    parser = argparse.ArgumentParser(description="Build the tabulated risk lookup")
+    parser.add_argument('--output', default=RISK_TABLE_PATH)
+    parser.add_argument('--max-cells', type=int, default=DEFAULT_MAX_CELLS)
+    parser.add_argument('--random-samples', type=int, default=100_000)
+    args = parser.parse_args()
+
+    engine = load_engine()
+    print(f"Split thresholds per feature: {[len(t) for t in split_thresholds(engine)]}")
+
+    start = time.perf_counter()
+    try:
+        table = RiskTable.build(engine, args.max_cells, artifact_version(COMPACT_MODEL_PATH))
+    except ValueError as e:
+        raise SystemExit(f"Cannot tabulate this forest: {e}")
+    build_seconds = time.perf_counter() - start
+    print(f"Built {len(table.table):,} cells ({table.nbytes / 1e6:.1f} MB) in {build_seconds:.2f}s")
+
+    X = pd.read_csv('diabetes.csv').drop('Outcome', axis=1).to_numpy()
+    rng = np.random.default_rng(0)
+    random_rows = rng.uniform(X.min(axis=0), X.max(axis=0), size=(args.random_samples, X.shape[1]))
+    print(f"diabetes.csv identical:   {verify(engine, table, X)}")
+    print(f"random sample identical:  {verify(engine, table, random_rows)}")
+
+    table.save(args.output)
+    print(f"Table saved as '{args.output}'")
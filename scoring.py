@@ -0,0 +1,89 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Column order the model was trained on, same as diabetes.csv minus Outcome
+FEATURE_NAMES = ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness',
+                 'Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age']
+
+# predict() picks the larger of the two class probabilities, i.e. risk > 0.5
+DEFAULT_THRESHOLD = 0.5
+
+Score = namedtuple('Score', ['label', 'risk_score', 'threshold'])
+
+
+def _positive_column(model):
+    """Index of the diabetic class in the model's predict_proba output"""
+    classes = list(model.classes_)
+    return classes.index(1) if 1 in classes else len(classes) - 1
+
+
+def impute_rows(model, rows):
+    """Replaces the zeros the model treats as missing with its training medians
+
+    A model trained on a cleaned CSV (see preprocessing.py) carries the
+    medians used for it as imputed_medians, {feature: median}, and expects
+    its inputs cleaned the same way. rows is a float (rows, features) array
+    in FEATURE_NAMES order, returned as is for models without medians and
+    copied otherwise.
+    """
+    medians = getattr(model, 'imputed_medians', None)
+    if not medians:
+        return rows
+    rows = np.array(rows, copy=True)
+    for name, median in medians.items():
+        column = rows[:, FEATURE_NAMES.index(name)]
+        column[column == 0] = median
+    return rows
+
+
+def prepare_rows(model, rows):
+    """Raw inputs as the (rows, features) float64 array the model scores
+
+    Rejects non-finite values and applies the model's imputation, every
+    scoring and explanation entry point goes through here.
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    if rows.ndim == 1:
+        rows = rows[np.newaxis, :]
+    check_finite(rows)
+    return impute_rows(model, rows)
+
+
+def check_finite(rows):
+    """Raises ValueError naming the first rows of a 2-D array with NaN or infinite values"""
+    bad = np.flatnonzero(~np.isfinite(rows).all(axis=1))
+    if len(bad):
+        shown = ', '.join(str(i) for i in bad[:5])
+        raise ValueError(f"{len(bad)} row(s) have missing or non-finite values (rows {shown}"
+                         f"{', ...' if len(bad) > 5 else ''})")
+
+
+def score_batch(model, rows, threshold=DEFAULT_THRESHOLD):
+    """Scores many rows with one forest pass, returns (labels, risk_scores)
+
+    rows are raw inputs, see prepare_rows. Raises ValueError when a row
+    holds NaN or infinity: the engines do not all route missing values the
+    way sklearn does, so they are never scored.
+    """
+    # A ReloadingEngine can swap models between calls, pin the current one so
+    # imputation and scoring both use the same forest
+    model = getattr(model, 'engine', model)
+    rows = prepare_rows(model, rows)
+    feature_names = getattr(model, 'feature_names_in_', None)
+    if feature_names is not None:
+        # An sklearn forest fitted on a DataFrame warns on bare arrays, give it
+        # the columns it knows (pandas is loaded along with sklearn anyway)
+        import pandas as pd
+        rows = pd.DataFrame(rows, columns=feature_names)
+
+    probability = model.predict_proba(rows)
+    risk_scores = probability[:, _positive_column(model)]
+    labels = (risk_scores > threshold).astype(np.int64)
+    return labels, risk_scores
+
+
+def score(model, row, threshold=DEFAULT_THRESHOLD):
+    """Scores a single patient, label and risk score come from the same pass"""
+    labels, risk_scores = score_batch(model, [row], threshold)
+    return Score(int(labels[0]), float(risk_scores[0]), threshold)
@@ -0,0 +1,341 @@
+"""Headless JSON scoring service with micro-batching
+
+POST /score with one patient, {"Glucose": 148, "BMI": 33.6, ...} using the
+FEATURE_NAMES keys, or {"instances": [...]} for several. GET /health returns
+batching counters (and drift status when a drift reference exists) and
+GET /metrics the Prometheus-format stage latencies.
+
+Requests that arrive within BATCH_WINDOW seconds of each other are stacked
+and scored with a single forest pass. The service is a plain ASGI app, run
+it with the small built-in asyncio server or any ASGI server:
+
+    python scoring_service.py --port 8080
+    uvicorn scoring_service:app
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+
+from drift_monitor import DRIFT_REFERENCE_PATH, DriftMonitor
+from metrics import registry, span
+from model_artifact import COMPACT_MODEL_PATH, ReloadingEngine
+from model_registry import ShadowScorer
+from prediction_cache import PredictionCache, cache_key
+from scoring import FEATURE_NAMES, DEFAULT_THRESHOLD, check_finite, score_batch
+
+BATCH_WINDOW = 0.002
+MAX_BATCH_ROWS = 1024
+MAX_BODY_BYTES = 1 << 20
+
+
+class MicroBatcher:
+    """Coalesces concurrent scoring calls into one batched forest evaluation"""
+
+    def __init__(self, engine, window=BATCH_WINDOW, max_batch=MAX_BATCH_ROWS,
+                 threshold=DEFAULT_THRESHOLD):
+        self.engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self.threshold = threshold
+        self.batches = 0
+        self.rows = 0
+        self._pending = []
+        self._pending_rows = 0
+        self._timer = None
+        # One scoring thread: batches stay in order and never compete for the GIL
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-score")
+
+    async def score(self, rows):
+        """Scores an (n, 8) array, returns (labels, risk_scores) for those rows"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((rows, future))
+        self._pending_rows += len(rows)
+
+        # The first request of a batch opens the window, a full batch closes it early
+        if self._pending_rows >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        self._pending_rows = 0
+        if not pending:
+            return
+
+        # The forest pass runs on the batcher's scoring thread so socket I/O
+        # carries on meanwhile, the futures are resolved back on the loop
+        rows = np.concatenate([rows for rows, _ in pending])
+        scored = asyncio.get_running_loop().run_in_executor(self._executor, self._score_rows, rows)
+        scored.add_done_callback(lambda done: self._resolve(pending, done))
+
+    def _score_rows(self, rows):
+        with span("service_batch_score"):
+            return score_batch(self.engine, rows, self.threshold)
+
+    def _resolve(self, pending, scored):
+        error = None if scored.cancelled() else scored.exception()
+        if scored.cancelled() or error is not None:
+            for _, future in pending:
+                if future.done():
+                    continue
+                if error is None:
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+            return
+
+        labels, risk_scores = scored.result()
+        self.batches += 1
+        self.rows += len(labels)
+        offset = 0
+        for rows, future in pending:
+            if not future.done():
+                future.set_result((labels[offset:offset + len(rows)],
+                                   risk_scores[offset:offset + len(rows)]))
+            offset += len(rows)
+
+
+def parse_payload(payload):
+    """Turns a request body into an (n, 8) float array, plus whether it was a list"""
+    is_batch = isinstance(payload, dict) and 'instances' in payload
+    instances = payload['instances'] if is_batch else [payload]
+    if not isinstance(instances, list) or not instances:
+        raise ValueError("'instances' must be a non-empty list")
+
+    rows = []
+    for instance in instances:
+        if isinstance(instance, dict):
+            missing = [name for name in FEATURE_NAMES if name not in instance]
+            if missing:
+                raise ValueError(f"Missing features: {', '.join(missing)}")
+            rows.append([float(instance[name]) for name in FEATURE_NAMES])
+        elif isinstance(instance, list) and len(instance) == len(FEATURE_NAMES):
+            rows.append([float(value) for value in instance])
+        else:
+            raise ValueError(f"Each instance must be an object or a list of {len(FEATURE_NAMES)} values")
+    rows = np.array(rows, dtype=np.float64)
+    # json.loads accepts NaN and Infinity, reject them here as a bad request
+    check_finite(rows)
+    return rows, is_batch
+
+
+class ScoringApp:
+    """ASGI application serving /score and /health"""
+
+    def __init__(self, engine=None, window=BATCH_WINDOW, max_batch=MAX_BATCH_ROWS,
+                 threshold=DEFAULT_THRESHOLD, cache=None, drift=None, shadow=None):
+        self._engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self.threshold = threshold
+        self.cache = cache
+        self.drift = drift
+        self.shadow = shadow
+        self._batcher = None
+
+    @property
+    def batcher(self):
+        # Built on first use so `uvicorn scoring_service:app` imports cheaply
+        if self._batcher is None:
+            engine = self._engine if self._engine is not None else ReloadingEngine()
+            self._batcher = MicroBatcher(engine, self.window, self.max_batch, self.threshold)
+        return self._batcher
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    self.batcher
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        method, path = scope['method'], scope['path']
+        if path == '/health' and method == 'GET':
+            batcher = self.batcher
+            health = {'status': 'ok', 'batches': batcher.batches, 'rows': batcher.rows}
+            if self.cache is not None:
+                health['cache'] = self.cache.stats()
+            if self.drift is not None:
+                health['drift'] = self.drift.status()
+            if self.shadow is not None:
+                health['shadow'] = self.shadow.stats()
+            await self._respond(send, 200, health)
+        elif path == '/metrics' and method == 'GET':
+            body = registry.render_prometheus().encode('utf-8')
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'text/plain; version=0.0.4')]})
+            await send({'type': 'http.response.body', 'body': body})
+        elif path == '/score' and method == 'POST':
+            with span("service_request"):
+                await self._score(receive, send)
+        else:
+            await self._respond(send, 404, {'error': f"No route for {method} {path}"})
+
+    async def _score(self, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_BYTES:
+                await self._respond(send, 413, {'error': "Request body too large"})
+                return
+            if not message.get('more_body'):
+                break
+
+        try:
+            rows, is_batch = parse_payload(json.loads(body))
+        except (ValueError, TypeError) as e:
+            await self._respond(send, 400, {'error': str(e)})
+            return
+
+        # Single repeat profiles are answered from the cache without joining a batch
+        key = cached = None
+        if self.cache is not None and not is_batch:
+            key = cache_key(rows[0])
+            cached = self.cache.get(key)
+
+        start = time.perf_counter()
+        if cached is not None:
+            risk_scores = np.array([cached])
+            labels = (risk_scores > self.threshold).astype(np.int64)
+        else:
+            labels, risk_scores = await self.batcher.score(rows)
+            if key is not None:
+                self.cache.put(key, float(risk_scores[0]))
+        if self.shadow is not None:
+            self.shadow.submit(rows, risk_scores, time.perf_counter() - start)
+        if self.drift is not None:
+            self.drift.observe_batch(rows, risk_scores)
+        predictions = [{'label': int(label), 'risk_score': float(risk)}
+                       for label, risk in zip(labels, risk_scores)]
+        if is_batch:
+            result = {'predictions': predictions, 'threshold': self.threshold}
+        else:
+            result = dict(predictions[0], threshold=self.threshold)
+        await self._respond(send, 200, result)
+
+    async def _respond(self, send, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = ScoringApp()
+
+
+async def _handle_connection(asgi_app, reader, writer):
+    """Minimal HTTP/1.1 keep-alive loop that forwards each request to the ASGI app"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, target, version = request_line.decode('latin-1').split()
+
+            headers = []
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers.append((name.strip().lower().encode('latin-1'),
+                                value.strip().encode('latin-1')))
+            header_map = dict(headers)
+
+            length = int(header_map.get(b'content-length', b'0'))
+            if length > MAX_BODY_BYTES:
+                break
+            body = await reader.readexactly(length) if length else b''
+
+            path, _, query = target.partition('?')
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': version[5:],
+                'method': method, 'path': path, 'query_string': query.encode('latin-1'),
+                'headers': headers,
+            }
+            response = {}
+            body_parts = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    response.update(message)
+                elif message['type'] == 'http.response.body':
+                    body_parts.append(message.get('body', b''))
+
+            await asgi_app(scope, receive, send)
+
+            keep_alive = (version == 'HTTP/1.1'
+                          and header_map.get(b'connection', b'').lower() != b'close')
+            payload = b''.join(body_parts)
+            status = response.get('status', 500)
+            head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+            head += [f"{name.decode('latin-1')}: {value.decode('latin-1')}"
+                     for name, value in response.get('headers', [])]
+            head.append(f"Content-Length: {len(payload)}")
+            head.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(asgi_app, host='127.0.0.1', port=8080):
+    """Serves asgi_app over HTTP until cancelled"""
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_connection(asgi_app, reader, writer), host, port)
+    print(f"Scoring service listening on http://{host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the headless scoring service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--window-ms', type=float, default=BATCH_WINDOW * 1e3)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH_ROWS)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--cache-size', type=int, default=10_000, help="0 disables the cache")
+    parser.add_argument('--cache-ttl', type=float, default=300.0)
+    parser.add_argument('--drift-reference', default=DRIFT_REFERENCE_PATH,
+                        help="training reference for drift monitoring, skipped if missing")
+    parser.add_argument('--shadow', action='store_true',
+                        help="also score every request with the candidate model, off the response path")
+    args = parser.parse_args()
+
+    cache = None
+    if args.cache_size > 0:
+        cache = PredictionCache(args.cache_size, args.cache_ttl, artifact_path=COMPACT_MODEL_PATH)
+    drift = DriftMonitor.from_file(args.drift_reference) if os.path.exists(args.drift_reference) else None
+    shadow = ShadowScorer.for_candidate(threshold=args.threshold) if args.shadow else None
+    service = ScoringApp(ReloadingEngine(), args.window_ms / 1e3, args.max_batch, args.threshold,
+                         cache, drift, shadow)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,88 @@
+"""Scoring engine warm-up for app workers, at server boot instead of first click
+
+    python startup.py --port 8501
+
+loads the scoring engine, scores one dummy patient so the artifact pages
+and NumPy code paths are hot, then starts the Streamlit server in the
+same process. app.py's load_engine() hands out this already warm engine.
+Plain `streamlit run app.py` still works, the first session warms it.
+
+Only lightweight modules are imported here: the single-row path is NumPy
+on a memory-mapped artifact, so pandas, sklearn and joblib stay unloaded
+until bulk scoring or a pickle fallback actually needs them.
+"""
+import argparse
+import os
+import threading
+import time
+
+from model_artifact import COMPACT_MODEL_PATH, COMPRESSED_MODEL_PATH, ReloadingEngine, load_forest
+from quantized_forest import QUANTIZED_MODEL_PATH, QuantizedForest
+from risk_table import RISK_TABLE_PATH, RiskTable
+from scoring import score
+
+# "tabulated" serves scores from the table built by risk_table.py, which
+# only fits small forests (not the shipped one, the full forest is served
+# while there is no table), "quantized" from the narrow-typed forest
+# written by quantized_forest.py
+SCORING_MODE = os.environ.get("DIABETES_SCORING_MODE", "forest")
+
+# "compressed" serves the smaller forest written by model_compression.py
+MODEL_VARIANT = os.environ.get("DIABETES_MODEL_VARIANT", "full")
+
+# File each mode scores with and how to load it. Derived artifacts are
+# checked against the full forest they were built from and hot-reloaded
+# like it, see ReloadingEngine
+if SCORING_MODE == "tabulated":
+    SERVED_MODEL_PATH, _loader = RISK_TABLE_PATH, RiskTable.load
+elif SCORING_MODE == "quantized":
+    SERVED_MODEL_PATH, _loader = QUANTIZED_MODEL_PATH, QuantizedForest.load
+elif MODEL_VARIANT == "compressed":
+    SERVED_MODEL_PATH, _loader = COMPRESSED_MODEL_PATH, load_forest
+else:
+    SERVED_MODEL_PATH, _loader = COMPACT_MODEL_PATH, None
+
+# A typical PIMA profile, only used to warm the engine
+WARMUP_ROW = [6, 148, 72, 35, 0, 33.6, 0.627, 50]
+
+_engine = None
+_lock = threading.Lock()
+
+
+def warm_engine():
+    """The process-wide scoring engine, loaded and warmed on the first call"""
+    global _engine
+    with _lock:
+        if _engine is None:
+            if _loader is None:
+                engine = ReloadingEngine(compact_path=SERVED_MODEL_PATH)
+            else:
+                engine = ReloadingEngine(compact_path=SERVED_MODEL_PATH, pickle_path=None,
+                                         loader=_loader, source_path=COMPACT_MODEL_PATH)
+            score(engine, WARMUP_ROW)
+            if engine.stale:
+                print(f"'{engine.compact_path}' {engine.fallback_reason}, serving "
+                      f"'{engine.served_path}' in its place")
+            _engine = engine
+    return _engine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the model, then serve app.py")
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--address', default=None)
+    args = parser.parse_args()
+
+    # app.py imports this file as `startup`, warm that module rather than __main__
+    import startup
+
+    start = time.perf_counter()
+    engine = startup.warm_engine()
+    print(f"Scoring engine warm in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    from streamlit.web import bootstrap
+
+    flag_options = {'server_port': args.port, 'server_address': args.address, 'server_headless': True}
+    bootstrap.load_config_options(flag_options)
+    bootstrap.run(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'),
+                  False, [], flag_options)
@@ -0,0 +1,170 @@
+"""Chunked, deterministic synthetic diabetes data
+
+Rows are produced in fixed blocks of BLOCK_ROWS. Block i draws from its own
+numpy Generator seeded with SeedSequence(seed, spawn_key=(i,)), the same
+stream SeedSequence(seed).spawn() would hand out, so any block can be made
+independently and in any process. Chunks are cut from those blocks, which
+keeps the output identical for a given seed whatever the chunk size or
+number of workers.
+"""
+import argparse
+import functools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BLOCK_ROWS = 65_536
+DEFAULT_CHUNK_SIZE = 4 * BLOCK_ROWS
+
+COLUMNS = ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness', 'Insulin',
+           'BMI', 'DiabetesPedigreeFunction', 'Age', 'Outcome']
+
+
+def generate_block(block_index, seed=42):
+    """Generates one full block of rows as a dict of column arrays"""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block_index,)))
+    n = BLOCK_ROWS
+
+    pregnancies = np.clip(rng.poisson(2, n), 0, 17)
+    glucose = np.clip(rng.normal(120, 30, n), 50, 300)
+    blood_pressure = np.clip(rng.normal(80, 15, n), 40, 180)
+    skin_thickness = np.clip(rng.normal(20, 10, n), 0, 100)
+    insulin = np.clip(rng.normal(80, 40, n), 0, 900)
+    bmi = np.clip(rng.normal(25, 5, n), 15, 70)
+    diabetes_pedigree = np.clip(rng.gamma(0.5, 1, n), 0, 3)
+    age = np.clip(rng.normal(35, 15, n), 18, 120)
+
+    diabetes_risk = (
+        0.1 * (glucose > 125) +
+        0.08 * (bmi > 30) +
+        0.06 * (age > 45) +
+        0.05 * (blood_pressure > 90) +
+        0.04 * diabetes_pedigree +
+        0.03 * (pregnancies > 3) +
+        rng.normal(0, 0.1, n)
+    )
+    outcome = (diabetes_risk > 0.3).astype(np.int64)
+
+    return dict(zip(COLUMNS, [pregnancies, glucose, blood_pressure, skin_thickness,
+                              insulin, bmi, diabetes_pedigree, age, outcome]))
+
+
+@functools.lru_cache(maxsize=1)
+def _cached_block(block_index, seed):
+    """generate_block, kept for the next call: consecutive small chunks
+    mostly fall in the same block, which is then drawn only once"""
+    block = generate_block(block_index, seed)
+    for values in block.values():
+        values.flags.writeable = False
+    return block
+
+
+def generate_rows(start, stop, seed=42):
+    """Rows [start, stop) of the dataset for seed, as a DataFrame"""
+    if stop <= start:
+        return pd.DataFrame({name: np.array([]) for name in COLUMNS})
+
+    pieces = []
+    for block_index in range(start // BLOCK_ROWS, (stop - 1) // BLOCK_ROWS + 1):
+        block_start = block_index * BLOCK_ROWS
+        block = _cached_block(block_index, seed)
+        lo = max(start, block_start) - block_start
+        hi = min(stop, block_start + BLOCK_ROWS) - block_start
+        pieces.append({name: values[lo:hi] for name, values in block.items()})
+
+    columns = {name: np.concatenate([piece[name] for piece in pieces]) for name in COLUMNS}
+    return pd.DataFrame(columns, index=pd.RangeIndex(start, stop))
+
+
+def _generate_range(args):
+    return generate_rows(*args)
+
+
+def iter_chunks(n_samples, chunk_size=DEFAULT_CHUNK_SIZE, seed=42, workers=None):
+    """Yields the dataset as consecutive DataFrames of up to chunk_size rows
+
+    With workers > 1 chunks are generated in a process pool, keeping at most
+    two chunks per worker in flight so memory stays bounded.
+    """
+    ranges = [(start, min(start + chunk_size, n_samples), seed)
+              for start in range(0, n_samples, chunk_size)]
+
+    if not workers or workers <= 1:
+        for chunk_range in ranges:
+            yield _generate_range(chunk_range)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk_range in ranges:
+            pending.append(pool.submit(_generate_range, chunk_range))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_dataset(path, n_samples, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE, seed=42, workers=None):
+    """Writes n_samples synthetic rows to path chunk by chunk
+
+    fmt is 'csv', 'parquet' (needs pyarrow) or 'npy', which writes one
+    .npy file per column into the directory at path.
+    """
+    chunks = iter_chunks(n_samples, chunk_size, seed, workers)
+
+    if fmt == 'csv':
+        for index, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+
+    elif fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    elif fmt == 'npy':
+        os.makedirs(path, exist_ok=True)
+        columns = None
+        for chunk in chunks:
+            if columns is None:
+                columns = {
+                    name: np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode='w+',
+                                                    dtype=chunk[name].dtype, shape=(n_samples,))
+                    for name in COLUMNS
+                }
+            for name in COLUMNS:
+                columns[name][chunk.index[0]:chunk.index[-1] + 1] = chunk[name].to_numpy()
+        for column in (columns or {}).values():
+            column.flush()
+
+    else:
+        raise ValueError(f"Unknown format '{fmt}', expected csv, parquet or npy")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic diabetes dataset")
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=['csv', 'parquet', 'npy'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    write_dataset(args.path, args.rows, args.format, args.chunk_size, args.seed, args.workers)
+    print(f"Wrote {args.rows:,} rows to '{args.path}'")
@@ -0,0 +1,107 @@
+"""What-if sweeps: risk curves and surfaces over feature value grids
+
+A curve moves one feature over a grid while the patient's other values
+stay put, a surface moves two (e.g. glucose x BMI). partial_dependence
+averages a curve over a whole population instead of one patient.
+
+With a forest engine the whole grid comes from one walk of the trees
+(FlatForest.grid_proba), so a 200 x 200 surface costs a few milliseconds.
+Engines without trees, like the risk table, score the expanded grid rows
+in one batched call per patient instead.
+"""
+import math
+
+import numpy as np
+
+from explanations import forest_of
+from scoring import FEATURE_NAMES, _positive_column, prepare_rows, score_batch
+
+# Sweep range of each feature, the same bounds the assessment form accepts
+FEATURE_RANGES = {
+    'Pregnancies': (0, 20),
+    'Glucose': (50, 300),
+    'BloodPressure': (40, 180),
+    'SkinThickness': (0, 100),
+    'Insulin': (0, 900),
+    'BMI': (15.0, 70.0),
+    'DiabetesPedigreeFunction': (0.0, 3.0),
+    'Age': (18, 120),
+}
+
+# Entered as whole numbers, so their grids never step between integers
+INTEGER_FEATURES = {'Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'Age'}
+
+
+def feature_grid(feature, points=200):
+    """Evenly spaced, increasing sweep values for feature over its form range
+
+    Integer features step by whole numbers, so they may get fewer points.
+    """
+    low, high = FEATURE_RANGES[feature]
+    if feature in INTEGER_FEATURES:
+        step = max(1, math.ceil((high - low) / (points - 1)))
+        return np.arange(low, high + 1, step, dtype=np.float64)
+    return np.linspace(low, high, points)
+
+
+def expand_grid(row, features, grids):
+    """Rows for every grid point, row's values everywhere else, in grid order"""
+    mesh = np.meshgrid(*grids, indexing='ij')
+    rows = np.repeat(np.asarray(row, dtype=np.float64)[np.newaxis, :], mesh[0].size, axis=0)
+    for feature, values in zip(features, mesh):
+        rows[:, feature] = values.ravel()
+    return rows
+
+
+def risk_grid(model, rows, features, grids, average=False):
+    """Risk scores of each row with features swept over grids
+
+    features are names from FEATURE_NAMES. Returns shape (rows, *grid
+    sizes), or the grid shape averaged over rows.
+    """
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+    indices = [FEATURE_NAMES.index(feature) for feature in features]
+    grids = [np.asarray(grid, dtype=np.float64) for grid in grids]
+
+    forest = forest_of(model)
+    if forest is not None:
+        rows = prepare_rows(forest, rows)
+        # Swept values the model treats as missing are imputed too. That can
+        # reorder a grid, so the walk gets the distinct imputed values and
+        # the result is indexed back into the requested order
+        medians = forest.imputed_medians or {}
+        walk_grids, inverses = [], []
+        for feature, grid in zip(features, grids):
+            if feature in medians:
+                grid = np.where(grid == 0, medians[feature], grid)
+            grid, inverse = np.unique(grid, return_inverse=True)
+            walk_grids.append(grid)
+            inverses.append(inverse)
+        risks = forest.grid_proba(rows, indices, walk_grids, _positive_column(forest), average)
+        return risks[(..., *np.ix_(*inverses))]
+
+    shape = tuple(len(grid) for grid in grids)
+    risks = np.empty((len(rows), *shape))
+    for i, row in enumerate(rows):
+        _, risk_scores = score_batch(model, expand_grid(row, indices, grids))
+        risks[i] = risk_scores.reshape(shape)
+    return risks.mean(axis=0) if average else risks
+
+
+def risk_curve(model, row, feature, values=None):
+    """(values, risk scores) for one patient as feature moves over values"""
+    values = feature_grid(feature) if values is None else np.asarray(values, dtype=np.float64)
+    return values, risk_grid(model, row, [feature], [values])[0]
+
+
+def risk_surface(model, row, x_feature, y_feature, x_values=None, y_values=None):
+    """(x values, y values, risk scores (x, y)) for one patient over two features"""
+    x_values = feature_grid(x_feature) if x_values is None else np.asarray(x_values, dtype=np.float64)
+    y_values = feature_grid(y_feature) if y_values is None else np.asarray(y_values, dtype=np.float64)
+    return x_values, y_values, risk_grid(model, row, [x_feature, y_feature], [x_values, y_values])[0]
+
+
+def partial_dependence(model, rows, feature, values=None):
+    """(values, mean risk score over rows) as feature moves over values"""
+    values = feature_grid(feature) if values is None else np.asarray(values, dtype=np.float64)
+    return values, risk_grid(model, rows, [feature], [values], average=True)